@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Pod Lookup Benchmark
+Compares listing every pod in every namespace with the namespaced app label
+selector used by get_pod, against a fake kubernetes API server with 5k pods
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def gen_pods(count, namespaces):
+    """Generate fake Pods spread over namespaces"""
+    pods = []
+    for i in range(count):
+        app = f"proj{i}"
+        pods.append(
+            {
+                "metadata": {
+                    "name": f"{app}-6d4cf56db6-{i:05x}",
+                    "namespace": (
+                        "default" if i % namespaces == 0 else f"ns{i % namespaces}"
+                    ),
+                    "labels": {"app": app, "pod-template-hash": "6d4cf56db6"},
+                    "creationTimestamp": "2024-01-01T00:00:00Z",
+                },
+                "spec": {
+                    "containers": [
+                        {
+                            "name": "odoobase",
+                            "image": "ghcr.io/ppreeper/odoobase:main",
+                            "env": [
+                                {"name": f"VAR_{n}", "value": "x" * 32}
+                                for n in range(20)
+                            ],
+                        }
+                    ]
+                },
+                "status": {"phase": "Running"},
+            }
+        )
+    return pods
+
+
+def pod_list(items):
+    """Encode a PodList"""
+    return json.dumps(
+        {
+            "kind": "PodList",
+            "apiVersion": "v1",
+            "metadata": {"resourceVersion": "1"},
+            "items": items,
+        }
+    ).encode()
+
+
+def fake_server(pods):
+    """Start a fake API server answering pod list calls"""
+    stats = {"requests": 0, "bytes": 0}
+    everything = pod_list(pods)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/api/v1/pods":
+                body = everything
+            elif url.path.startswith("/api/v1/namespaces/"):
+                ns = url.path.split("/")[4]
+                selector = query.get("labelSelector", [""])[0]
+                key, _, value = selector.partition("=")
+                body = pod_list(
+                    [
+                        pod
+                        for pod in pods
+                        if pod["metadata"]["namespace"] == ns
+                        and (not key or pod["metadata"]["labels"].get(key) == value)
+                    ]
+                )
+            else:
+                self.send_error(404)
+                return
+            stats["requests"] += 1
+            stats["bytes"] += len(body)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def write_kubeconfig(path, server):
+    """Write a kubeconfig pointing at the fake API server"""
+    with open(path, "w", encoding="UTF-8") as f:
+        json.dump(
+            {
+                "apiVersion": "v1",
+                "kind": "Config",
+                "clusters": [{"name": "fake", "cluster": {"server": server}}],
+                "users": [{"name": "fake", "user": {}}],
+                "contexts": [
+                    {"name": "fake", "context": {"cluster": "fake", "user": "fake"}}
+                ],
+                "current-context": "fake",
+            },
+            f,
+        )
+
+
+def timed(func, runs, stats):
+    """Run func and return median ms and bytes transferred per run"""
+    times = []
+    stats["bytes"] = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), stats["bytes"] / runs
+
+
+def main():
+    """Pod Lookup Benchmark"""
+    parser = argparse.ArgumentParser(description="oda get_pod benchmark")
+    parser.add_argument("--pods", type=int, default=5000, help="number of pods")
+    parser.add_argument("--namespaces", type=int, default=20, help="namespaces")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="runs per lookup")
+    args = parser.parse_args()
+
+    server, stats = fake_server(gen_pods(args.pods, args.namespaces))
+    with tempfile.TemporaryDirectory() as tmp:
+        kubeconfig = os.path.join(tmp, "config")
+        write_kubeconfig(kubeconfig, f"http://127.0.0.1:{server.server_port}")
+        os.environ["KUBECONFIG"] = kubeconfig
+        import oda
+
+        target = f"proj{args.namespaces * 2}"
+
+        def all_namespaces():
+            ret = oda.core_v1().list_pod_for_all_namespaces(watch=False)
+            for pod in ret.items:
+                if pod.metadata.name.startswith(target):
+                    return pod.metadata.name
+
+        def label_selector():
+            oda.pod_cache.clear()
+            return oda.get_pod(target)
+
+        def cached():
+            return oda.get_pod(target)
+
+        print(f"{args.pods} pods, looking up {target}")
+        print(f"{'lookup':<16} {'ms':>9} {'bytes':>12}")
+        for name, func in [
+            ("all namespaces", all_namespaces),
+            ("label selector", label_selector),
+            ("cached", cached),
+        ]:
+            ms, size = timed(func, args.runs, stats)
+            print(f"{name:<16} {ms:>9.2f} {size:>12.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Manifest Generation Benchmark
+Generates and writes a manifest set for 500 projects, comparing one yaml.dump
+and write per object with a single dump_all pass and the JSON lines mode
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import oda  # pylint: disable=wrong-import-position
+
+
+def per_object(path, docs):
+    """Dump and write every object on its own"""
+    with open(path, "w", encoding="UTF-8") as manifest:
+        for doc in docs:
+            manifest.write("---\n" + yaml.dump(doc))
+
+
+def single_pass(fmt):
+    """Dump every object in one pass"""
+
+    def write(path, docs):
+        with open(path, "w", encoding="UTF-8") as manifest:
+            manifest.write(oda.dump_manifest(docs, fmt))
+
+    return write
+
+
+def main():
+    """Manifest Generation Benchmark"""
+    parser = argparse.ArgumentParser(description="oda manifest benchmark")
+    parser.add_argument("--projects", type=int, default=500, help="projects")
+    args = parser.parse_args()
+
+    print(f"{args.projects} projects, libyaml {yaml.__with_libyaml__}")
+    print(f"{'writer':<16} {'seconds':>9} {'bytes':>12}")
+    for name, ext, writer in [
+        ("per object", "yaml", per_object),
+        ("dump_all", "yaml", single_pass("yaml")),
+        ("jsonl", "jsonl", single_pass("jsonl")),
+    ]:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            for i in range(args.projects):
+                docs = list(oda.gen_project(f"project{i}", "17.0").values())
+                writer(os.path.join(tmp, f"project{i}.{ext}"), docs)
+            seconds = time.perf_counter() - start
+            size = sum(
+                os.path.getsize(os.path.join(tmp, file)) for file in os.listdir(tmp)
+            )
+        print(f"{name:<16} {seconds:>9.3f} {size:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""odoo.conf Access Benchmark
+Reads the odoo.conf keys a backup, restore and query run need, comparing a
+file read per key with the mtime cached configparser accessor
+"""
+
+import argparse
+import configparser
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import oda  # pylint: disable=wrong-import-position
+
+original_read = configparser.ConfigParser.read
+
+# keys read by backup, restore and query --sql in one run
+command_keys = [
+    "db_name",
+    "db_password",
+    "db_host",
+    "db_port",
+    "db_user",
+    "data_dir",
+    "db_host",
+    "db_port",
+    "db_user",
+    "db_password",
+    "db_name",
+    "db_user",
+    "db_password",
+]
+
+
+def per_key(path):
+    """Open and scan the file for every key"""
+    stats = {"parses": 0}
+
+    def get(key):
+        stats["parses"] += 1
+        with open(path, "r", encoding="UTF-8") as f:
+            for line in f.readlines():
+                if line.startswith(key):
+                    return line.split("=")[1].strip()
+        return None
+
+    return get, stats
+
+
+def cached(path):
+    """Read through the mtime cached accessor"""
+    stats = {"parses": 0}
+
+    def counted(self, *args, **kwargs):
+        stats["parses"] += 1
+        return original_read(self, *args, **kwargs)
+
+    configparser.ConfigParser.read = counted
+
+    def get(key):
+        return oda.odoo_conf(path).get("options", key)
+
+    return get, stats
+
+
+def main():
+    """odoo.conf Access Benchmark"""
+    parser = argparse.ArgumentParser(description="oda odoo.conf benchmark")
+    parser.add_argument("-n", "--runs", type=int, default=200, help="command runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "odoo.conf")
+        oda.save_odoo_conf(path, oda.gen_odoo_conf("project", "20240101000000"))
+        print(f"{len(command_keys)} keys per command run, {args.runs} runs")
+        print(f"{'accessor':<16} {'ms/run':>9} {'parses/run':>11}")
+        for name, make, fresh in [
+            ("per key", per_key, True),
+            ("cached", cached, True),
+            ("cached, batch", cached, False),
+        ]:
+            times = []
+            parses = []
+            for _ in range(args.runs):
+                # every command run is a new process with an empty cache,
+                # a --batch run keeps it across commands
+                if fresh:
+                    oda.odoo_conf_cache.clear()
+                get, stats = make(path)
+                start = time.perf_counter()
+                for key in command_keys:
+                    get(key)
+                times.append((time.perf_counter() - start) * 1000)
+                parses.append(stats["parses"])
+            print(
+                f"{name:<16} {statistics.median(times):>9.3f}"
+                f" {statistics.mean(parses):>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Startup Benchmark
+Measures the cold-start time of every oda subcommand using python -X importtime
+Each command is run with --help so that only import and argparse cost is measured,
+then the commands that need no cluster are run for real to measure the imports
+they load on dispatch
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ODA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "oda.py")
+
+COMMANDS = [
+    ["--version"],
+    ["config", "vscode"],
+    ["config", "pyright"],
+    ["completions", "show"],
+    ["completions", "install"],
+    ["kube", "gen", "postgres"],
+    ["kube", "gen", "odoo"],
+    ["kube", "apply", "postgres"],
+    ["kube", "apply", "odoo"],
+    ["start"],
+    ["stop"],
+    ["restart"],
+    ["app", "install"],
+    ["app", "upgrade"],
+    ["logs"],
+    ["scaffold"],
+    ["psql"],
+    ["query"],
+    ["backup"],
+    ["restore"],
+    ["snapshot", "save"],
+    ["snapshot", "restore"],
+    ["snapshot", "list"],
+    ["snapshot", "delete"],
+    ["admin", "username"],
+    ["admin", "password"],
+    ["project", "init"],
+    ["project", "branch"],
+    ["project", "list"],
+    ["project", "reset"],
+    ["project", "rebuild"],
+    ["repo", "update"],
+    ["repo", "mirror", "refresh"],
+    ["repo", "base", "clone"],
+    ["repo", "base", "update"],
+    ["repo", "branch", "clone"],
+    ["repo", "branch", "update"],
+]
+
+# commands run without --help, they work without a cluster in an empty HOME
+DISPATCHED = [
+    ["completions", "show"],
+    ["kube", "gen", "postgres", "16"],
+    ["kube", "gen", "postgres", "16", "--format", "jsonl"],
+    ["project", "list"],
+]
+
+
+def parse_importtime(stderr):
+    """Return the total import time in us and the slowest top level imports"""
+    total = 0
+    top = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line.split("|", 2)
+        self_us = int(self_us.split(":")[1])
+        name = name[1:]
+        total += self_us
+        if not name.startswith("  "):
+            top.append((int(cumulative), name.strip()))
+    top.sort(reverse=True)
+    return total, top[:3]
+
+
+def run(args, env, show_help=True):
+    """Run oda once and return wall time in ms and the importtime output"""
+    cmd = [sys.executable, "-X", "importtime", ODA] + args
+    if show_help and args != ["--version"]:
+        cmd.append("--help")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        cmd, capture_output=True, text=True, env=env, cwd=env["HOME"], check=False
+    )
+    wall = (time.perf_counter() - start) * 1000
+    return wall, proc.stderr
+
+
+def main():
+    """Startup Benchmark"""
+    parser = argparse.ArgumentParser(description="oda cold-start benchmark")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="runs per command")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        os.makedirs(os.path.join(home, "workspace", "repos", "odoo"))
+        env = dict(os.environ, HOME=home)
+        for title, commands, show_help in [
+            ("command --help", COMMANDS, True),
+            ("command, dispatched", DISPATCHED, False),
+        ]:
+            print(f"{title:<40} {'wall ms':>9} {'import ms':>10}  slowest imports")
+            for command in commands:
+                walls = []
+                imports = []
+                top = []
+                for _ in range(args.runs):
+                    wall, stderr = run(command, env, show_help)
+                    total, top = parse_importtime(stderr)
+                    walls.append(wall)
+                    imports.append(total / 1000)
+                slowest = ", ".join(f"{name} {us / 1000:.1f}" for us, name in top)
+                print(
+                    f"{' '.join(command):<40} {statistics.median(walls):>9.1f}"
+                    f" {statistics.median(imports):>10.1f}  {slowest}"
+                )
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Version Checkout Benchmark
+Compares copytree of the base repos with git worktrees for 5 versions,
+against a local bare repo fixture, reporting wall time and disk usage
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import oda  # pylint: disable=wrong-import-position
+
+VERSIONS = ["13.0", "14.0", "15.0", "16.0", "17.0"]
+
+
+def git(*args, cwd=None):
+    """Run git quietly"""
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+def make_fixture(path, files, commits):
+    """Create a bare repo with a branch per version"""
+    work = os.path.join(path, "work")
+    git("init", "-q", "-b", "master", work)
+    git("config", "user.email", "bench@localhost", cwd=work)
+    git("config", "user.name", "bench", cwd=work)
+    for version in ["master"] + VERSIONS:
+        if version != "master":
+            git("checkout", "-q", "-b", version, "master", cwd=work)
+        for c in range(commits):
+            for f in range(files):
+                with open(os.path.join(work, f"file{f}.py"), "wb") as out:
+                    out.write(os.urandom(4096))
+            git("add", "-A", cwd=work)
+            git("commit", "-q", "-m", f"{version} {c}", cwd=work)
+    git("checkout", "-q", "master", cwd=work)
+    bare = os.path.join(path, "origin.git")
+    git("clone", "-q", "--bare", work, bare)
+    shutil.rmtree(work)
+    return bare
+
+
+def disk_usage(path):
+    """Disk usage of a tree in bytes, counting hardlinked files once"""
+    seen = set()
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            st = os.lstat(os.path.join(root, name))
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_blocks * 512
+    return total
+
+
+def copytree_clone(version):
+    """The previous repo branch clone, copying the whole base repos"""
+    for name in ["odoo", "enterprise"]:
+        path = os.path.join(oda.repo_dir, version, name)
+        shutil.copytree(os.path.join(oda.repo_dir, name), path)
+        git("checkout", "-q", version, cwd=path)
+        git("pull", "-q", cwd=path)
+
+
+def main():
+    """Version Checkout Benchmark"""
+    parser = argparse.ArgumentParser(description="oda repo branch clone benchmark")
+    parser.add_argument("--files", type=int, default=50, help="files per commit")
+    parser.add_argument("--commits", type=int, default=10, help="commits per branch")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bare = make_fixture(tmp, args.files, args.commits)
+        oda.versions_index = os.path.join(tmp, "versions")
+        print(f"fixture {disk_usage(bare) / 2**20:.1f} MiB, {len(VERSIONS)} versions")
+        print(f"{'method':<10} {'seconds':>9} {'versions MiB':>13}")
+        for method, clone in [
+            ("copytree", copytree_clone),
+            ("worktree", oda.repo_branch_clone),
+        ]:
+            oda.repo_dir = os.path.join(tmp, method)
+            for name in ["odoo", "enterprise"]:
+                git("clone", "-q", bare, os.path.join(oda.repo_dir, name))
+            base = disk_usage(oda.repo_dir)
+            start = time.perf_counter()
+            for version in VERSIONS:
+                clone(version)
+            seconds = time.perf_counter() - start
+            used = (disk_usage(oda.repo_dir) - base) / 2**20
+            print(f"{method:<10} {seconds:>9.2f} {used:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,14 @@
 This tool uses a local kubernetes cluster to spin up develompent environments
 It manages the Odoo source repositories in the workspace/repo/odoo directory
 """
-from shutil import copytree, rmtree
+
+from contextlib import contextmanager
+from functools import lru_cache
+from shutil import rmtree
+import copy
+import hashlib
+import re
+import shlex
 import json
 import base64
 import subprocess
@@ -12,16 +19,9 @@ import os
 import sys
 import time
 from pathlib import Path
-import yaml
-from git import Repo
-from passlib.context import CryptContext
-from kubernetes import client, config, utils
-from kubernetes.stream import stream
 
-# load kubernetes config
-config.load_kube_config()
-v1 = client.CoreV1Api()
-k8s_client = client.ApiClient()
+# kubernetes, git, passlib and yaml are imported where they are used so that
+# --help, --version and local-only commands do not pay for them at startup
 
 SEMVER = "0.1.0"
 # paths
@@ -31,22 +31,155 @@ manifests = os.path.join(config_dir, "oda/manifests")
 storage = os.path.join(local_dir, "oda")
 repo_dir = os.path.join(Path.home(), "workspace/repos/odoo")
 project_dir = os.path.join(Path.home(), "workspace/odoo")
+registry_db = os.path.join(storage, "oda.db")
+versions_index = os.path.join(storage, "versions")
+mirrors_dir = os.path.join(storage, "mirrors")
+mirror_max_age = 3600
+snapshots_dir = os.path.join(project_dir, "snapshots")
+snapshot_budget = 50 * 2**30
+logs_dir = os.path.join(storage, "logs")
+base_repos = {
+    "odoo": os.environ.get("ODA_ODOO_URL", "https://github.com/odoo/odoo"),
+    "enterprise": os.environ.get(
+        "ODA_ENTERPRISE_URL", "https://github.com/odoo/enterprise"
+    ),
+}
+completions_file = os.path.join(
+    local_dir, "share", "bash-completion", "completions", "oda"
+)
 CWD = os.getcwd()
+odoo_conf_cache = {}
+# kubernetes
+namespace = "default"
+pod_cache = {}
+exec_sessions = {}
+port_forwards = {}
+field_manager = "oda"
+hash_annotation = "oda/manifest-hash"
+manifest_formats = ["yaml", "jsonl"]
+apply_order = [
+    ["PersistentVolume"],
+    ["PersistentVolumeClaim"],
+    ["ConfigMap", "Secret"],
+    ["StatefulSet", "Deployment"],
+    ["Service"],
+    ["Ingress"],
+]
+# pod paths
+backup_dir = "/opt/odoo/backups"
 # images
 container_image = {"name": "odoobase", "image": "ghcr.io/ppreeper/odoobase:main"}
 
 
+# ===================
+# kubernetes clients
+@lru_cache(maxsize=None)
+def kube_config():
+    """Load the kubernetes config once per run"""
+    from kubernetes import config
+
+    config.load_kube_config()
+
+
+@lru_cache(maxsize=None)
+def api_client():
+    """Get the cached kubernetes ApiClient"""
+    from kubernetes import client
+
+    kube_config()
+    return client.ApiClient()
+
+
+@lru_cache(maxsize=None)
+def core_v1():
+    """Get the cached kubernetes CoreV1Api"""
+    from kubernetes import client
+
+    return client.CoreV1Api(api_client())
+
+
+@lru_cache(maxsize=None)
+def dynamic_client():
+    """Get the cached kubernetes DynamicClient"""
+    from kubernetes import dynamic
+
+    return dynamic.DynamicClient(api_client())
+
+
+@lru_cache(maxsize=None)
+def apps_v1():
+    """Get the cached kubernetes AppsV1Api"""
+    from kubernetes import client
+
+    return client.AppsV1Api(api_client())
+
+
+# ===================
+# project registry
+@lru_cache(maxsize=None)
+def registry():
+    """Get the cached project registry connection"""
+    import sqlite3
+
+    os.makedirs(storage, exist_ok=True)
+    conn = sqlite3.connect(registry_db)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""CREATE TABLE IF NOT EXISTS projects (
+            name TEXT PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            version TEXT NOT NULL,
+            edition TEXT NOT NULL,
+            db_name TEXT NOT NULL,
+            port INTEGER NOT NULL,
+            created TEXT NOT NULL
+        )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS snapshots (
+            project TEXT NOT NULL,
+            name TEXT NOT NULL,
+            db_name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            used REAL NOT NULL,
+            PRIMARY KEY (project, name)
+        )""")
+    return conn
+
+
+def register_project(name, path, version, edition, db_name, port=8069):
+    """Add or replace a project in the registry"""
+    created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time()))
+    with registry() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, path, version, edition, db_name, port, created),
+        )
+    return
+
+
+def get_project(path):
+    """Get the registered project at path"""
+    return (
+        registry().execute("SELECT * FROM projects WHERE path = ?", (path,)).fetchone()
+    )
+
+
+def project_name():
+    """Get the name of the project in the current directory"""
+    project = get_project(CWD)
+    return project["name"] if project is not None else os.path.basename(CWD)
+
+
 def check_project(func, *args, **kwargs):
     """Check if it is a project directory decorator"""
 
     def wrapper(*args, **kwargs):
         if not os.path.exists(os.path.join(CWD, "conf", "odoo.conf")):
             print("not in a project directory")
-            return
-        if not os.path.exists(os.path.join(CWD, f"{os.path.basename(CWD)}.yaml")):
+            return 1
+        if not os.path.exists(os.path.join(CWD, f"{project_name()}.yaml")):
             print("no project manifest found")
-            return
-        func(*args, **kwargs)
+            return 1
+        return func(*args, **kwargs)
 
     return wrapper
 
@@ -62,27 +195,80 @@ def are_you_sure(action):
     return True
 
 
-def change_password(new_password):
+@lru_cache(maxsize=None)
+def crypt_context(rounds=None):
+    """Get the cached pbkdf2_sha512 CryptContext, passlib's default rounds unless given"""
+    from passlib.context import CryptContext
+
+    if rounds is None:
+        return CryptContext(schemes=["pbkdf2_sha512"])
+    return CryptContext(schemes=["pbkdf2_sha512"], pbkdf2_sha512__rounds=rounds)
+
+
+def change_password(new_password, rounds=None):
     """Generate Password Hash"""
     new_password = new_password.strip()
     if new_password == "":
         return
-    ctx = CryptContext(schemes=["pbkdf2_sha512"])
-    pw_hash = ctx.hash(new_password)
+    pw_hash = crypt_context(rounds).hash(new_password)
     return pw_hash
 
 
-def get_odoo_conf(key):
+def hash_login(row, rounds=None):
+    """Hash the password of a (login, password) row"""
+    login, password = row
+    return change_password(password, rounds), login
+
+
+def odoo_conf(path=None):
+    """Get the parsed odoo.conf, parsed again only when the file changes"""
+    import configparser
+
+    path = path or os.path.join(CWD, "conf", "odoo.conf")
+    mtime = os.stat(path).st_mtime_ns
+    cached = odoo_conf_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        conf = configparser.ConfigParser(interpolation=None)
+        conf.read(path, encoding="UTF-8")
+        if not conf.has_section("options"):
+            conf.add_section("options")
+        odoo_conf_cache[path] = (mtime, conf)
+    return odoo_conf_cache[path][1]
+
+
+def get_odoo_conf(key, fallback=None):
     """get key value from odoo.conf"""
-    with open(
-        os.path.join(CWD, "conf", "odoo.conf"),
-        "r",
-        encoding="UTF-8",
-    ) as f:
-        lines = f.readlines()
-        for line in lines:
-            if line.startswith(key):
-                return line.split("=")[1].strip()
+    return odoo_conf().get("options", key, fallback=fallback)
+
+
+def get_odoo_conf_int(key, fallback=None):
+    """get integer key value from odoo.conf"""
+    return odoo_conf().getint("options", key, fallback=fallback)
+
+
+def get_odoo_conf_bool(key, fallback=None):
+    """get boolean key value from odoo.conf"""
+    return odoo_conf().getboolean("options", key, fallback=fallback)
+
+
+def save_odoo_conf(path, options):
+    """Write the options of an odoo.conf file"""
+    import configparser
+
+    conf = configparser.ConfigParser(interpolation=None)
+    conf["options"] = {k: str(v) for k, v in options.items()}
+    with open(path, "w", encoding="UTF-8") as f:
+        conf.write(f)
+    odoo_conf_cache.pop(path, None)
+    return
+
+
+def set_odoo_conf(key, value):
+    """Set a key in odoo.conf"""
+    path = os.path.join(CWD, "conf", "odoo.conf")
+    options = dict(odoo_conf(path)["options"])
+    options[key] = value
+    save_odoo_conf(path, options)
     return
 
 
@@ -102,45 +288,496 @@ def parse_modules(modules):
     return ",".join(parse_multi(modules))
 
 
-def get_pod(name):
-    """Get Pod from name"""
-    ret = v1.list_pod_for_all_namespaces(watch=False)
-    for pod in ret.items:
-        if pod.metadata.name.startswith(name):
-            return pod.metadata.name
+def running_pod(pods):
+    """Get the newest running Pod name from a list of Pods"""
+    running = [
+        pod
+        for pod in pods
+        if pod.status.phase == "Running" and pod.metadata.deletion_timestamp is None
+    ]
+    if not running:
+        return
+    running.sort(key=lambda pod: pod.metadata.creation_timestamp or "")
+    return running[-1].metadata.name
+
+
+def get_pod(name, timeout=60):
+    """Get Pod from the app label, waiting for a pending Pod to start"""
+    if name in pod_cache:
+        return pod_cache[name]
+    selector = f"app={name}"
+    pods = core_v1().list_namespaced_pod(namespace, label_selector=selector)
+    pod_name = running_pod(pods.items)
+    if pod_name is None and pods.items:
+        from kubernetes import watch
+
+        print(f"waiting for {name} to start")
+        w = watch.Watch()
+        for event in w.stream(
+            core_v1().list_namespaced_pod,
+            namespace,
+            label_selector=selector,
+            resource_version=pods.metadata.resource_version,
+            timeout_seconds=timeout,
+        ):
+            if event["type"] != "DELETED":
+                pod_name = running_pod([event["object"]])
+            if pod_name is not None:
+                w.stop()
+    if pod_name is None:
+        print(f"no running pod found for {name}")
+        return
+    pod_cache[name] = pod_name
+    return pod_name
+
+
+def manifest_volume_index(manifest_files):
+    """Index PersistentVolumeClaim volumeNames and PersistentVolume hostPaths from manifests"""
+    claims = {}
+    volumes = {}
+    for manifest in manifest_files:
+        if not os.path.exists(manifest):
+            continue
+        for doc in load_manifest(manifest):
+            name = doc["metadata"]["name"]
+            if doc["kind"] == "PersistentVolumeClaim":
+                claims[name] = doc["spec"].get("volumeName", "")
+            elif doc["kind"] == "PersistentVolume" and "hostPath" in doc["spec"]:
+                volumes[name] = doc["spec"]["hostPath"]["path"]
+    return claims, volumes
+
+
+def cluster_volume_index():
+    """Index PersistentVolumeClaim volumeNames and PersistentVolume hostPaths from the cluster"""
+    pvcs = core_v1().list_namespaced_persistent_volume_claim(namespace=namespace)
+    pvs = core_v1().list_persistent_volume()
+    claims = {pvc.metadata.name: pvc.spec.volume_name for pvc in pvcs.items}
+    volumes = {
+        pv.metadata.name: pv.spec.host_path.path
+        for pv in pvs.items
+        if pv.spec.host_path is not None
+    }
+    return claims, volumes
 
 
 def get_host_paths(manifest):
     """Get PersistenVolume hostPath"""
+    claim_names = []
+    for doc in load_manifest(manifest):
+        if doc["kind"] == "Deployment":
+            vols = doc["spec"]["template"]["spec"]["volumes"]
+            for vol in vols:
+                if vol["name"].startswith("odoo") or vol["name"].startswith(
+                    "enterprise"
+                ):
+                    claim_names.append(vol["persistentVolumeClaim"]["claimName"])
+
+    # the hostPaths are known from the generated manifests, only ask the
+    # cluster about claims that were created some other way
+    claims, volumes = manifest_volume_index([manifest, find_manifest("odoo")])
+    if any(volumes.get(claims.get(name)) is None for name in claim_names):
+        cluster_claims, cluster_volumes = cluster_volume_index()
+        claims = {**cluster_claims, **claims}
+        volumes = {**cluster_volumes, **volumes}
+
     host_paths = []
+    for name in claim_names:
+        host_path = volumes.get(claims.get(name))
+        if host_path is not None:
+            host_paths.append(host_path)
+    return host_paths
+
+
+# ===================
+# pod exec sessions
+def exec_session(pod_name):
+    """Get the shell session of a Pod, opened once per run"""
+    from kubernetes.stream import stream
+
+    session = exec_sessions.get(pod_name)
+    if session is None or not session.is_open():
+        session = stream(
+            core_v1().connect_get_namespaced_pod_exec,
+            pod_name,
+            namespace,
+            command=["sh"],
+            stderr=True,
+            stdin=True,
+            stdout=True,
+            tty=False,
+            _preload_content=False,
+        )
+        exec_sessions[pod_name] = session
+    return session
+
+
+def close_sessions():
+    """Close the open Pod shell sessions and port forwards"""
+    for session in exec_sessions.values():
+        session.close()
+    exec_sessions.clear()
+    for proc in port_forwards.values():
+        proc.terminate()
+    port_forwards.clear()
+    return
+
+
+def forget_pod(name):
+    """Drop the cached Pod of an app and close its shell session"""
+    pod_name = pod_cache.pop(name, None)
+    session = exec_sessions.pop(pod_name, None)
+    if session is not None:
+        session.close()
+    return
+
+
+def pod_exec(pod_name, command, echo=True, on_line=None):
+    """Run a command over the Pod shell session and return its exit code and output"""
+    import uuid
+
+    session = exec_session(pod_name)
+    # the exit code follows a marker, the newline before it puts it at a line start
+    marker = f"__oda_{uuid.uuid4().hex}__"
+    session.write_stdin(
+        f"{shlex.join(command)} </dev/null 2>&1; printf '\\n%s %s\\n' {marker} $?\n"
+    )
+    # echoed output is handed on line by line and only kept when it is not echoed
+    lines = []
+    emit = (on_line or print) if echo else lines.append
+    pending = None
+    buffer = ""
+    while session.is_open():
+        session.update(timeout=1)
+        if session.peek_stderr():
+            print(session.read_stderr(), end="", file=sys.stderr)
+        if not session.peek_stdout():
+            continue
+        buffer += session.read_stdout()
+        *complete, buffer = buffer.split("\n")
+        for line in complete:
+            if line.startswith(marker):
+                # the line held back is ours when the output ended in a newline
+                if pending:
+                    emit(pending)
+                return int(line.split()[1]), "\n".join(lines)
+            if pending is not None:
+                emit(pending)
+            pending = line
+    exec_sessions.pop(pod_name, None)
+    return -1, "\n".join(lines)
+
+
+loading_module = re.compile(r"Loading module (\S+) \((\d+)/(\d+)\)")
+
+
+def odoo_output(log=None):
+    """Line handler for odoo-bin output, with a module loading progress line on a tty"""
+    tty = sys.stdout.isatty()
+    status = {"line": ""}
+
+    def show(line):
+        if log is not None:
+            log.write(f"{line}\n")
+        if tty and status["line"]:
+            print("\r\033[K", end="")
+        print(line)
+        match = loading_module.search(line)
+        if match:
+            module, n, total = match.groups()
+            status["line"] = (
+                f"[{n}/{total}] {100 * int(n) // int(total)}% loading {module}"
+            )
+        if tty and status["line"]:
+            print(status["line"], end="", flush=True)
+
+    def done():
+        if tty and status["line"]:
+            print("\r\033[K", end="", flush=True)
+
+    return show, done
+
+
+def odoo_exec(pod_name, command, log_file=None):
+    """Run odoo-bin in the Pod, streaming its output and teeing it to log_file"""
+    log = open(log_file, "a", encoding="UTF-8") if log_file else None
+    show, done = odoo_output(log)
+    try:
+        returncode, _ = pod_exec(pod_name, command, on_line=show)
+    finally:
+        done()
+        if log is not None:
+            log.close()
+    if returncode != 0:
+        print(f"{command[0]} exited with {returncode}")
+    return returncode
+
+
+# ===================
+# database
+@lru_cache(maxsize=None)
+def port_forward(pod_name, port):
+    """Forward a local port to a Pod port for the rest of the run"""
+    proc = subprocess.Popen(
+        ["kubectl", "port-forward", "--address", "127.0.0.1", pod_name, f":{port}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    port_forwards[(pod_name, port)] = proc
+    # Forwarding from 127.0.0.1:40357 -> 5432
+    line = proc.stdout.readline()
+    if not line.startswith("Forwarding from"):
+        raise OSError(f"port-forward to {pod_name} failed")
+    return int(line.split()[2].rsplit(":", 1)[1])
+
+
+@lru_cache(maxsize=None)
+def db_pool(dbname):
+    """Get the cached connection pool of a project database"""
+    from psycopg2.pool import ThreadedConnectionPool
+
+    # ODA_DB_HOST/ODA_DB_PORT reach postgres directly, otherwise through kubectl
+    host = os.environ.get("ODA_DB_HOST")
+    port = os.environ.get("ODA_DB_PORT") or get_odoo_conf_int("db_port", 5432)
+    if host is None:
+        host, port = "127.0.0.1", port_forward("postgres-0", 5432)
+    return ThreadedConnectionPool(
+        1,
+        8,
+        host=host,
+        port=port,
+        user=get_odoo_conf("db_user"),
+        password=get_odoo_conf("db_password"),
+        dbname=dbname,
+        application_name="oda",
+    )
+
+
+@contextmanager
+def db_connection(dbname=None, readonly=False, autocommit=False):
+    """Borrow a connection from the project database pool for one transaction"""
+    pool = db_pool(dbname or get_odoo_conf("db_name"))
+    conn = pool.getconn()
+    try:
+        conn.set_session(readonly=readonly, autocommit=autocommit)
+        if autocommit:
+            # psycopg2 2.9 opens a transaction in `with conn` even in autocommit
+            yield conn
+        else:
+            with conn:
+                yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def db_execute(statement, params=None, dbname=None, autocommit=False):
+    """Run one parameterized statement and return the number of affected rows"""
+    with db_connection(dbname, autocommit=autocommit) as conn:
+        with conn.cursor() as cur:
+            cur.execute(statement, params)
+            return cur.rowcount
+
+
+def db_execute_many(statement, rows, dbname=None):
+    """Run a parameterized statement for every row in a single transaction"""
+    from psycopg2.extras import execute_batch
+
+    with db_connection(dbname) as conn:
+        with conn.cursor() as cur:
+            execute_batch(cur, statement, rows, page_size=500)
+    return
+
+
+# ===================
+# kubernetes apply
+def manifest_format(manifest):
+    """Get the format of a manifest from its extension"""
+    return "jsonl" if manifest.endswith(".jsonl") else "yaml"
+
+
+def find_manifest(name):
+    """Get the most recently generated yaml or jsonl manifest"""
+    paths = [os.path.join(manifests, f"{name}.{fmt}") for fmt in manifest_formats]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return os.path.join(manifests, f"{name}.yaml")
+    return max(paths, key=os.path.getmtime)
+
+
+def parse_manifest(content, fmt="yaml"):
+    """Parse the objects of a multi-document yaml or JSON lines manifest"""
+    if fmt == "jsonl":
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    import yaml
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return [doc for doc in yaml.load_all(content, Loader=loader) if doc]
+
+
+def dump_manifest(docs, fmt="yaml"):
+    """Serialize manifest objects in a single pass"""
+    if fmt == "jsonl":
+        return "".join(json.dumps(doc, sort_keys=True) + "\n" for doc in docs)
+    import yaml
+
+    dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+    return yaml.dump_all(docs, Dumper=dumper, explicit_start=True)
+
+
+def load_manifest(manifest):
+    """Load the objects of a manifest file"""
     with open(manifest, "r", encoding="UTF-8") as file:
-        docs = yaml.safe_load_all(file)
-        for doc in docs:
-            if doc["kind"] == "Deployment":
-                vols = doc["spec"]["template"]["spec"]["volumes"]
-                for vol in vols:
-                    if vol["name"].startswith("odoo") or vol["name"].startswith(
-                        "enterprise"
-                    ):
-                        pvc_name = vol["persistentVolumeClaim"]["claimName"]
-                        pvcs = v1.list_namespaced_persistent_volume_claim(
-                            namespace="default"
-                        )
-                        pv_name = ""
-                        for pvc in pvcs.items:
-                            if pvc.metadata.name == pvc_name:
-                                pv_name = pvc.spec.volume_name
-                        pvs = v1.list_persistent_volume()
-                        for pv in pvs.items:
-                            if pv.metadata.name == pv_name:
-                                host_paths.append(pv.spec.host_path.path)
+        return parse_manifest(file.read(), manifest_format(manifest))
 
-    return host_paths
+
+def manifest_hash(doc):
+    """Hash a manifest object"""
+    return hashlib.sha256(json.dumps(doc, sort_keys=True).encode()).hexdigest()
+
+
+def get_resource(doc):
+    """Get the API resource and namespace of a manifest object"""
+    resource = dynamic_client().resources.get(
+        api_version=doc["apiVersion"], kind=doc["kind"]
+    )
+    return resource, namespace if resource.namespaced else None
+
+
+def apply_object(doc):
+    """Server-side apply an object, skipping it if the manifest is unchanged"""
+    from kubernetes.dynamic.exceptions import NotFoundError
+
+    resource, ns = get_resource(doc)
+    name = doc["metadata"]["name"]
+    digest = manifest_hash(doc)
+    try:
+        current = resource.get(name=name, namespace=ns)
+        annotations = current.metadata.annotations
+        if annotations and annotations[hash_annotation] == digest:
+            return "unchanged"
+        action = "configured"
+    except NotFoundError:
+        action = "created"
+    body = copy.deepcopy(doc)
+    body["metadata"].setdefault("annotations", {})[hash_annotation] = digest
+    resource.server_side_apply(
+        body=body,
+        name=name,
+        namespace=ns,
+        field_manager=field_manager,
+        force_conflicts=True,
+    )
+    return action
+
+
+def apply_tiers(docs):
+    """Group manifest objects into dependency ordered tiers"""
+    tiers = [[] for _ in range(len(apply_order) + 1)]
+    for doc in docs:
+        tier = len(apply_order)
+        for i, kinds in enumerate(apply_order):
+            if doc["kind"] in kinds:
+                tier = i
+                break
+        tiers[tier].append(doc)
+    return [tier for tier in tiers if tier]
+
+
+def timed_apply(doc):
+    """Apply an object and time it"""
+    start_time = time.perf_counter()
+    action = apply_object(doc)
+    return action, time.perf_counter() - start_time
+
+
+def apply_manifest(manifest, verbose=True, jobs=8):
+    """Apply a manifest tier by tier, sending each tier concurrently"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    docs = load_manifest(manifest)
+    # resolve the API resources up front so discovery is not raced by the pool
+    for doc in docs:
+        get_resource(doc)
+    timings = []
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for tier in apply_tiers(docs):
+            futures = [(doc, pool.submit(timed_apply, doc)) for doc in tier]
+            failed = False
+            for doc, future in futures:
+                name = f"{doc['kind']}/{doc['metadata']['name']}"
+                try:
+                    action, seconds = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    print(f"{name} failed: {e}")
+                    failed = True
+                    continue
+                timings.append((name, action, seconds))
+            if failed:
+                print("stopping, later objects depend on the failed ones")
+                break
+    for name, action, seconds in timings:
+        if verbose or action != "unchanged":
+            print(f"{name:<48} {action:<10} {seconds * 1000:>8.1f} ms")
+    print(f"{len(timings)} objects in {time.perf_counter() - start_time:.2f}s")
+    return
+
+
+def delete_objects(manifest, kinds):
+    """Delete the objects of the given kinds in a manifest"""
+    from kubernetes.dynamic.exceptions import NotFoundError
+
+    for doc in load_manifest(manifest):
+        if doc["kind"] not in kinds:
+            continue
+        resource, ns = get_resource(doc)
+        try:
+            resource.delete(name=doc["metadata"]["name"], namespace=ns)
+            print(f"{doc['kind']}/{doc['metadata']['name']} deleted")
+        except NotFoundError:
+            pass
+    return
 
 
 # ===================
 # ===================
 # kubenetes manifest generation
+def object_key(doc):
+    """Get the (kind, name) key of a manifest object"""
+    return (doc["kind"], doc["metadata"]["name"])
+
+
+def add_objects(graph, *docs):
+    """Add objects to a manifest graph, replacing any with the same kind and name"""
+    for doc in docs:
+        graph[object_key(doc)] = doc
+
+
+def write_manifest(manifest, graph):
+    """Write a manifest graph, only rewriting the file when its content changed"""
+    fmt = manifest_format(manifest)
+    content = dump_manifest(list(graph.values()), fmt)
+    digest = hashlib.sha256(content.encode()).hexdigest()
+    if os.path.exists(manifest):
+        with open(manifest, "r", encoding="UTF-8") as file:
+            old_content = file.read()
+        if hashlib.sha256(old_content.encode()).hexdigest() == digest:
+            print(f"{manifest} unchanged")
+            return False
+        previous = {object_key(doc): doc for doc in parse_manifest(old_content, fmt)}
+        for key, doc in graph.items():
+            if key not in previous:
+                print(f"added {key[0]}/{key[1]}")
+            elif previous[key] != doc:
+                print(f"changed {key[0]}/{key[1]}")
+        for key in previous:
+            if key not in graph:
+                print(f"removed {key[0]}/{key[1]}")
+    with open(manifest, "w", encoding="UTF-8") as file:
+        file.write(content)
+    return True
+
+
 def gen_pv(volume, acl, size, path):
     """Generate a PersistentVolume"""
     cfg = {
@@ -154,8 +791,7 @@ def gen_pv(volume, acl, size, path):
             "hostPath": {"path": path},
         },
     }
-    yaml_string = yaml.dump(cfg)
-    return "---\n" + yaml_string
+    return cfg
 
 
 def gen_pvc(volume, acl, size):
@@ -170,8 +806,7 @@ def gen_pvc(volume, acl, size):
             "volumeName": f"{volume}-pv",
         },
     }
-    yaml_string = yaml.dump(cfg)
-    return "---\n" + yaml_string
+    return cfg
 
 
 def gen_secret(name, password):
@@ -185,8 +820,7 @@ def gen_secret(name, password):
             "password": base64.b64encode(bytes(password, "utf-8")).decode(),
         },
     }
-    yaml_string = yaml.dump(cfg)
-    return "---\n" + yaml_string
+    return cfg
 
 
 def gen_service(name, port_list):
@@ -205,8 +839,7 @@ def gen_service(name, port_list):
         },
         "spec": {"selector": {"app": name}, "ports": port_dict, "clusterIP": "None"},
     }
-    yaml_string = yaml.dump(cfg)
-    return "---\n" + yaml_string
+    return cfg
 
 
 def gen_ingress(ingress, port_list):
@@ -229,8 +862,7 @@ def gen_ingress(ingress, port_list):
         },
         "spec": {"rules": [{"host": f"{ingress}.local", "http": {"paths": port_dict}}]},
     }
-    yaml_string = yaml.dump(cfg)
-    return "---\n" + yaml_string
+    return cfg
 
 
 def gen_deployment(deployment, image, ports, volumes, globalvols):
@@ -285,8 +917,7 @@ def gen_deployment(deployment, image, ports, volumes, globalvols):
             },
         },
     }
-    yaml_string = yaml.dump(cfg)
-    return "---\n" + yaml_string
+    return cfg
 
 
 def gen_postgres_statefulset(name, version, image, port_list):
@@ -348,14 +979,14 @@ def gen_postgres_statefulset(name, version, image, port_list):
                             "name": "config",
                             "configMap": {
                                 "name": f"{name}-config",
-                                "defaultMode": "0o755",
+                                "defaultMode": 0o755,
                             },
                         },
                         {
                             "name": "init",
                             "configMap": {
                                 "name": f"{name}-init",
-                                "defaultMode": "0o755",
+                                "defaultMode": 0o755,
                             },
                         },
                         {
@@ -369,8 +1000,7 @@ def gen_postgres_statefulset(name, version, image, port_list):
             },
         },
     }
-    yaml_string = yaml.dump(cfg)
-    return "---\n" + yaml_string
+    return cfg
 
 
 def gen_configmap(name, kv_list):
@@ -386,8 +1016,7 @@ def gen_configmap(name, kv_list):
         },
         "data": data,
     }
-    yaml_string = yaml.dump(cfg)
-    return "---\n" + yaml_string
+    return cfg
 
 
 # ===================
@@ -397,7 +1026,7 @@ def gen_configmap(name, kv_list):
 @check_project
 def config_vscode():
     """Write the VSCode config"""
-    project = os.path.basename(CWD)
+    project = project_name()
     host_paths = get_host_paths(os.path.join(CWD, f"{project}.yaml"))
     if not os.path.exists(os.path.join(CWD, ".vscode")):
         os.makedirs(os.path.join(CWD, ".vscode"))
@@ -458,7 +1087,7 @@ def config_vscode():
 @check_project
 def config_pyright():
     """Write pyrightconfig.json"""
-    project = os.path.basename(CWD)
+    project = project_name()
     host_paths = get_host_paths(os.path.join(CWD, f"{project}.yaml"))
     host_paths.append("addons")
 
@@ -483,44 +1112,47 @@ def config_pyright():
 # ===================
 # kube
 # kube gen postgres
-def kube_gen_postgres(version):
+def kube_gen_postgres(version, fmt="yaml"):
     """Generate PostgreSQL Manifest"""
     print(f"postgres {version} manifest")
     if not os.path.exists(manifests):
         os.makedirs(manifests)
-    postgres_manifest = os.path.join(manifests, "postgres.yaml")
+    postgres_manifest = os.path.join(manifests, f"postgres.{fmt}")
 
     if not os.path.exists(os.path.join(local_dir, "oda", "postgres", version, "data")):
         os.makedirs(os.path.join(local_dir, "oda", "postgres", version, "data"))
 
-    with open(postgres_manifest, "w", encoding="UTF-8") as postgres:
-        # secret
-        postgres.write(gen_secret("postgres", "postgres"))
-        # pv
-        postgres.write(
-            gen_pv(
-                f"postgres-{version}",
-                "ReadWriteOnce",
-                "10Gi",
-                os.path.join(local_dir, "oda", "postgres", version, "data"),
-            )
-        )
-        # pvc
-        postgres.write(
-            gen_pvc(
-                f"postgres-{version}",
-                "ReadWriteOnce",
-                "10Gi",
-            )
-        )
-        # configmap-config
-        postgres.write(
-            gen_configmap(
-                "postgres-config",
+    graph = {}
+    # secret
+    add_objects(graph, gen_secret("postgres", "postgres"))
+    # pv
+    add_objects(
+        graph,
+        gen_pv(
+            f"postgres-{version}",
+            "ReadWriteOnce",
+            "10Gi",
+            os.path.join(local_dir, "oda", "postgres", version, "data"),
+        ),
+    )
+    # pvc
+    add_objects(
+        graph,
+        gen_pvc(
+            f"postgres-{version}",
+            "ReadWriteOnce",
+            "10Gi",
+        ),
+    )
+    # configmap-config
+    add_objects(
+        graph,
+        gen_configmap(
+            "postgres-config",
+            [
                 [
-                    [
-                        "pg_hba.conf",
-                        """    # TYPE  DATABASE        USER            ADDRESS                 METHOD
+                    "pg_hba.conf",
+                    """    # TYPE  DATABASE        USER            ADDRESS                 METHOD
     # "local" is for Unix domain socket connections only
     local   all             all                                     trust
     # IPv4 local connections:
@@ -535,10 +1167,10 @@ def kube_gen_postgres(version):
 
     host all all all scram-sha-256
 """,
-                    ],
-                    [
-                        "postgresql.conf",
-                        """data_directory = '/data/pgdata'
+                ],
+                [
+                    "postgresql.conf",
+                    """data_directory = '/data/pgdata'
     hba_file = '/config/pg_hba.conf'
     ident_file = '/config/pg_ident.conf'
 
@@ -560,91 +1192,111 @@ def kube_gen_postgres(version):
     lc_time = 'en_US.utf8'                              # locale for time formatting
 
     default_text_search_config = 'pg_catalog.english'""",
-                    ],
                 ],
-            )
-        )
-        # configmap-init
-        postgres.write(
-            gen_configmap(
-                "postgres-init",
+            ],
+        ),
+    )
+    # configmap-init
+    add_objects(
+        graph,
+        gen_configmap(
+            "postgres-init",
+            [
                 [
-                    [
-                        "createodoouser.sql",
-                        "CREATE ROLE odoodev WITH LOGIN CREATEDB PASSWORD 'odooodoo'",
-                    ]
-                ],
-            )
-        )
-        # statefulset
-        postgres.write(
-            gen_postgres_statefulset(
-                "postgres",
-                version,
-                f"postgres:{version}-alpine",
-                [["postgres", 5432]],
-            )
-        )
-        # service
-        postgres.write(gen_service("postgres", [["postgres", 5432]]))
+                    "createodoouser.sql",
+                    "CREATE ROLE odoodev WITH LOGIN CREATEDB PASSWORD 'odooodoo'",
+                ]
+            ],
+        ),
+    )
+    # statefulset
+    add_objects(
+        graph,
+        gen_postgres_statefulset(
+            "postgres",
+            version,
+            f"postgres:{version}-alpine",
+            [["postgres", 5432]],
+        ),
+    )
+    # service
+    add_objects(graph, gen_service("postgres", [["postgres", 5432]]))
+    write_manifest(postgres_manifest, graph)
     return
 
 
-def kube_apply_postgres():
+def kube_apply_postgres(jobs=8):
     """Start PostgreSQL"""
-    postgres_manifest = os.path.join(manifests, "postgres.yaml")
-    utils.create_from_yaml(k8s_client, postgres_manifest, verbose=True)
+    postgres_manifest = find_manifest("postgres")
+    apply_manifest(postgres_manifest, verbose=True, jobs=jobs)
     return
 
 
 def get_current_odoo_repos():
     """Get Currently Copied Odoo Repos"""
+    if not os.path.exists(repo_dir):
+        return []
     dirnames = os.listdir(repo_dir)
     dirnames = [dir for dir in dirnames if dir != "odoo"]
     dirnames = [dir for dir in dirnames if dir != "enterprise"]
+    write_versions_index(dirnames)
     return dirnames
 
 
+def write_versions_index(versions):
+    """Write the version list read by shell completion"""
+    content = "".join(f"{version}\n" for version in sorted(versions))
+    if os.path.exists(versions_index):
+        with open(versions_index, "r", encoding="UTF-8") as index:
+            if index.read() == content:
+                return
+    os.makedirs(storage, exist_ok=True)
+    with open(versions_index, "w", encoding="UTF-8") as index:
+        index.write(content)
+    return
+
+
 # kube gen odoo
-def kube_gen_odoo():
+def kube_gen_odoo(fmt="yaml"):
     """Generate Odoo Volume Manifest"""
     print("odoo manifest")
     if not os.path.exists(manifests):
         os.makedirs(manifests)
     if not os.path.exists(os.path.join(project_dir, "backups")):
         os.makedirs(os.path.join(project_dir, "backups"))
-    odoo_manifest = os.path.join(manifests, "odoo.yaml")
-    dirnames = get_current_odoo_repos()
-    with open(odoo_manifest, "w", encoding="UTF-8") as odoo:
-        for dirname in dirnames:
-            dname = dirname.replace(".", "-")
-            dirs = os.listdir(os.path.join(repo_dir, dirname))
-            for d in dirs:
-                odoo.write(
-                    gen_pv(
-                        f"{d}-{dname}",
-                        "ReadOnlyMany",
-                        "10Gi",
-                        os.path.join(repo_dir, dirname, d),
-                    )
-                )
-                odoo.write(gen_pvc(f"{d}-{dname}", "ReadOnlyMany", "10Gi"))
-                odoo.write(
-                    gen_pv(
-                        "backups",
-                        "ReadWriteMany",
-                        "10Gi",
-                        os.path.join(project_dir, "backups"),
-                    )
-                )
-                odoo.write(gen_pvc("backups", "ReadWriteMany", "10Gi"))
+    odoo_manifest = os.path.join(manifests, f"odoo.{fmt}")
+    graph = {}
+    add_objects(
+        graph,
+        gen_pv(
+            "backups",
+            "ReadWriteMany",
+            "10Gi",
+            os.path.join(project_dir, "backups"),
+        ),
+        gen_pvc("backups", "ReadWriteMany", "10Gi"),
+    )
+    for dirname in sorted(get_current_odoo_repos()):
+        dname = dirname.replace(".", "-")
+        for d in sorted(os.listdir(os.path.join(repo_dir, dirname))):
+            add_objects(
+                graph,
+                gen_pv(
+                    f"{d}-{dname}",
+                    "ReadOnlyMany",
+                    "10Gi",
+                    os.path.join(repo_dir, dirname, d),
+                ),
+                gen_pvc(f"{d}-{dname}", "ReadOnlyMany", "10Gi"),
+            )
+    write_manifest(odoo_manifest, graph)
     return
 
 
-def kube_apply_odoo():
+def kube_apply_odoo(jobs=8):
     """Start Odoo Volumes"""
-    odoo_manifest = os.path.join(manifests, "odoo.yaml")
-    utils.create_from_yaml(k8s_client, odoo_manifest, verbose=False)
+    odoo_manifest = find_manifest("odoo")
+    apply_manifest(odoo_manifest, verbose=False, jobs=jobs)
     return
 
 
@@ -653,8 +1305,8 @@ def kube_apply_odoo():
 @check_project
 def start():
     """Start the instance"""
-    project = os.path.basename(CWD)
-    utils.create_from_yaml(k8s_client, f"{project}.yaml", verbose=False)
+    project = project_name()
+    apply_manifest(os.path.join(CWD, f"{project}.yaml"), verbose=False)
     return
 
 
@@ -663,8 +1315,10 @@ def start():
 @check_project
 def stop():
     """Stop the instance"""
-    project = os.path.basename(CWD)
-    subprocess.run(["kubectl", "delete", "-f", f"{project}.yaml"], check=False)
+    project = project_name()
+    # volumes, service and ingress are kept so start is only a rollout
+    delete_objects(os.path.join(CWD, f"{project}.yaml"), ["Deployment"])
+    forget_pod(project)
     return
 
 
@@ -673,9 +1327,12 @@ def stop():
 @check_project
 def restart():
     """Restart the instance"""
-    project = os.path.basename(CWD)
+    project = project_name()
     pod = get_pod(project)
-    v1.delete_namespaced_pod(pod, "default")
+    if pod is None:
+        return
+    core_v1().delete_namespaced_pod(pod, namespace)
+    forget_pod(project)
     return
 
 
@@ -684,13 +1341,14 @@ def restart():
 # app install
 # app upgrade
 @check_project
-def app_install_upgrade(modules, install=True):
+def app_install_upgrade(modules, install=True, log_file=None):
     """Install Upgrade modules"""
     iu = "-i" if install else "-u"
-    project = os.path.basename(CWD)
+    project = project_name()
     pod_name = get_pod(project)
+    if pod_name is None:
+        return
     mod_list = parse_modules(modules)
-    pod_name = get_pod(project)
     exec_command = [
         "odoo/odoo-bin",
         "--no-http",
@@ -698,17 +1356,82 @@ def app_install_upgrade(modules, install=True):
         iu,
         f"{mod_list}",
     ]
-    stream(
-        v1.connect_get_namespaced_pod_exec,
-        pod_name,
-        "default",
-        command=exec_command,
-        stderr=True,
-        stdin=False,
-        stdout=True,
-        tty=False,
-    )
-    return
+    return odoo_exec(pod_name, exec_command, log_file)
+
+
+def open_project_session(project):
+    """Find the pod of a project and open its shell session, or say why not"""
+    try:
+        pod_name = get_pod(project)
+        if pod_name is None:
+            return None, "not running"
+        exec_session(pod_name)
+    except Exception as e:  # pylint: disable=broad-except
+        return None, str(e)
+    return pod_name, ""
+
+
+def upgrade_project(project, pod_name, modules):
+    """Upgrade modules in one project, logging the output to the logs directory"""
+    start_time = time.perf_counter()
+    last = {"line": ""}
+
+    def write(line):
+        log.write(f"{line}\n")
+        last["line"] = line
+
+    exec_command = ["odoo/odoo-bin", "--no-http", "--stop-after-init", "-u", modules]
+    try:
+        os.makedirs(logs_dir, exist_ok=True)
+        log_file = os.path.join(logs_dir, f"{project}.upgrade.log")
+        with open(log_file, "w", encoding="UTF-8") as log:
+            returncode, _ = pod_exec(pod_name, exec_command, on_line=write)
+    except Exception as e:  # pylint: disable=broad-except
+        return "error", time.perf_counter() - start_time, str(e)
+    status = "ok" if returncode == 0 else f"failed ({returncode})"
+    return status, time.perf_counter() - start_time, last["line"]
+
+
+def app_upgrade_projects(modules, pattern, jobs=4):
+    """Upgrade modules in every registered project matching pattern"""
+    from concurrent.futures import ThreadPoolExecutor
+    from fnmatch import fnmatch
+
+    mod_list = parse_modules(modules)
+    projects = [
+        project["name"]
+        for project in registry().execute("SELECT name FROM projects ORDER BY name")
+        if pattern == "all" or fnmatch(project["name"], pattern)
+    ]
+    if not projects:
+        print(f"no projects match {pattern}")
+        return 1
+    # stream() swaps call_api on the shared ApiClient while it connects, so pod
+    # lookups and session setup stay on this thread and the pool only drives
+    # sessions that are already open
+    results = {}
+    pods = {}
+    for project in projects:
+        pod_name, reason = open_project_session(project)
+        if pod_name is not None:
+            pods[project] = pod_name
+        elif reason == "not running":
+            results[project] = ("not running", 0.0, "")
+        else:
+            results[project] = ("error", 0.0, reason)
+    print(f"upgrading {mod_list} in {len(pods)} projects, {jobs} at a time")
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            project: pool.submit(upgrade_project, project, pod_name, mod_list)
+            for project, pod_name in pods.items()
+        }
+    results.update({project: future.result() for project, future in futures.items()})
+    print(f"{'project':<24} {'status':<12} {'duration':>9}  last line")
+    for project in projects:
+        status, seconds, line = results[project]
+        print(f"{project:<24} {status:<12} {seconds:>8.1f}s  {line[:80]}")
+    print(f"logs in {logs_dir}")
+    return int(any(status != "ok" for status, _, _ in results.values()))
 
 
 # ===================
@@ -716,8 +1439,10 @@ def app_install_upgrade(modules, install=True):
 @check_project
 def logs():
     """Show logs"""
-    project = os.path.basename(CWD)
+    project = project_name()
     pod_name = get_pod(project)
+    if pod_name is None:
+        return
     subprocess.run(["kubectl", "logs", "-f", pod_name], check=True)
     return
 
@@ -725,23 +1450,15 @@ def logs():
 # ===================
 # scaffold
 @check_project
-def scaffold(module):
+def scaffold(module, log_file=None):
     """Scaffold an App"""
-    project = os.path.basename(CWD)
+    project = project_name()
     pod_name = get_pod(project)
+    if pod_name is None:
+        return
 
     exec_command = ["odoo/odoo-bin", "scaffold", f"{module}", "/opt/odoo/addons/."]
-    stream(
-        v1.connect_get_namespaced_pod_exec,
-        pod_name,
-        "default",
-        command=exec_command,
-        stderr=True,
-        stdin=False,
-        stdout=True,
-        tty=False,
-    )
-    return
+    return odoo_exec(pod_name, exec_command, log_file)
 
 
 # ===================
@@ -751,6 +1468,8 @@ def psql():
     """Connect to Database"""
     db = get_odoo_conf("db_name")
     pod_name = get_pod("postgres")
+    if pod_name is None:
+        return
     subprocess.run(
         [
             "kubectl",
@@ -771,119 +1490,761 @@ def psql():
 
 # ===================
 # query
-def query():
-    """Query Odoo"""
-    # TODO: query
-    print("query")
+def rpc_connection(url):
+    """Open a keep-alive HTTP connection to an Odoo server"""
+    import http.client
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    if parts.scheme == "https":
+        return http.client.HTTPSConnection(parts.netloc, timeout=300)
+    return http.client.HTTPConnection(parts.netloc, timeout=300)
+
+
+def json_rpc(conn, service, method, *args):
+    """Call an Odoo JSON-RPC service method over an open connection"""
+    body = json.dumps(
+        {
+            "jsonrpc": "2.0",
+            "method": "call",
+            "params": {"service": service, "method": method, "args": args},
+        }
+    )
+    conn.request("POST", "/jsonrpc", body, {"Content-Type": "application/json"})
+    reply = json.loads(conn.getresponse().read())
+    if reply.get("error"):
+        error = reply["error"]
+        raise RuntimeError(error.get("data", {}).get("message") or error["message"])
+    return reply["result"]
+
+
+def search_read_pages(call, model, domain, fields, limit, offset, batch_size):
+    """Yield search_read rows page by page, keyed on id so no page rescans the ones before"""
+    last_id = None
+    while limit is None or limit > 0:
+        size = batch_size if limit is None else min(batch_size, limit)
+        page_domain = domain if last_id is None else [["id", ">", last_id]] + domain
+        rows = call(
+            model,
+            "search_read",
+            [page_domain],
+            {
+                "fields": fields,
+                "limit": size,
+                "offset": offset if last_id is None else 0,
+                "order": "id",
+            },
+        )
+        yield from rows
+        if len(rows) < size:
+            return
+        last_id = rows[-1]["id"]
+        if limit is not None:
+            limit -= len(rows)
+
+
+def write_rows(rows, fmt, fields, out):
+    """Stream rows to out as NDJSON or CSV"""
+    import csv
+
+    if fmt == "ndjson":
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return
+    writer = None
+    for row in rows:
+        if writer is None:
+            # search_read always returns the id, asked for or not
+            columns = ["id"] + [f for f in fields if f != "id"] if fields else list(row)
+            writer = csv.DictWriter(out, fieldnames=columns)
+            writer.writeheader()
+        # many2one and x2many values are lists, keep them readable in a cell
+        writer.writerow(
+            {
+                k: json.dumps(v) if isinstance(v, (list, dict)) else v
+                for k, v in row.items()
+            }
+        )
     return
 
 
+def sql_query(
+    statement, db=None, limit=None, offset=0, count=False, fmt="ndjson", batch_size=1000
+):
+    """Stream a read-only SQL query from the project database"""
+    from psycopg2 import sql
+
+    # the statement is wrapped so limit, offset and count apply to any SELECT
+    inner = sql.SQL(statement.strip().rstrip(";"))
+    if count:
+        wrapped = sql.SQL("SELECT count(*) FROM ({}) q").format(inner)
+    else:
+        wrapped = sql.SQL("SELECT * FROM ({}) q OFFSET {}").format(
+            inner, sql.Literal(offset)
+        )
+        if limit is not None:
+            wrapped = sql.SQL("{} LIMIT {}").format(wrapped, sql.Literal(limit))
+    with db_connection(db, readonly=True) as conn:
+        if count:
+            with conn.cursor() as cur:
+                cur.execute(wrapped)
+                print(cur.fetchone()[0])
+            return 0
+        if fmt == "csv":
+            with conn.cursor() as cur:
+                cur.copy_expert(
+                    sql.SQL("COPY ({}) TO STDOUT WITH CSV HEADER")
+                    .format(wrapped)
+                    .as_string(conn),
+                    sys.stdout,
+                )
+            return 0
+        # a named cursor lives on the server and is fetched batch_size rows at a time
+        with conn.cursor(name="oda_query") as cur:
+            cur.itersize = batch_size
+            cur.execute(wrapped)
+            columns = None
+            for row in cur:
+                if columns is None:
+                    columns = [column.name for column in cur.description]
+                sys.stdout.write(
+                    json.dumps(dict(zip(columns, row)), default=str) + "\n"
+                )
+    return 0
+
+
+@check_project
+def query(
+    model,
+    db=None,
+    user="admin",
+    password="admin",
+    domain="[]",
+    fields=None,
+    limit=None,
+    offset=0,
+    count=False,
+    fmt="ndjson",
+    batch_size=1000,
+    url=None,
+    raw_sql=False,
+):
+    """Query Odoo"""
+    import ast
+
+    if raw_sql:
+        try:
+            return sql_query(model, db, limit, offset, count, fmt, batch_size)
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"query failed: {e}", file=sys.stderr)
+            return 1
+    db = db or get_odoo_conf("db_name")
+    url = url or f"http://{project_name()}.local"
+    try:
+        terms = ast.literal_eval(domain or "[]")
+        if not isinstance(terms, list):
+            raise ValueError(domain)
+        # leaves become lists, the '|', '&' and '!' operators stay strings
+        domain = [
+            list(term) if isinstance(term, (list, tuple)) else term for term in terms
+        ]
+    except (ValueError, SyntaxError, TypeError):
+        print(f"invalid domain {domain}")
+        return 1
+    fields = fields.split(",") if fields else []
+    conn = rpc_connection(url)
+    try:
+        uid = json_rpc(conn, "common", "login", db, user, password)
+        if not uid:
+            print(f"login failed for {user} on {db}")
+            return 1
+
+        def call(model, method, args, kwargs):
+            return json_rpc(
+                conn,
+                "object",
+                "execute_kw",
+                db,
+                uid,
+                password,
+                model,
+                method,
+                args,
+                kwargs,
+            )
+
+        if count:
+            print(call(model, "search_count", [domain], {}))
+            return 0
+        rows = search_read_pages(call, model, domain, fields, limit, offset, batch_size)
+        write_rows(rows, fmt, fields, sys.stdout)
+    except (OSError, RuntimeError) as e:
+        print(f"query failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
 # ===================
 # backup
+def run_timed(command):
+    """Run a command and return its exit code and duration"""
+    start_time = time.perf_counter()
+    returncode = subprocess.run(command, check=False).returncode
+    return returncode, time.perf_counter() - start_time
+
+
+def path_size(path):
+    """Size in bytes of a file or directory tree"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
 @check_project
-def backup():
+def backup(jobs=4, level=3):
     """Backup to file"""
-    project = os.path.basename(CWD)
+    from concurrent.futures import ThreadPoolExecutor
+
+    project = project_name()
     pod_name = get_pod(project)
-    subprocess.run(
-        ["kubectl", "exec", "--stdin", "--tty", pod_name, "--", "oda_db.py", "-b"],
-        check=True,
+    if pod_name is None:
+        return 1
+    db = get_odoo_conf("db_name")
+    t = time.strftime("%Y%m%d%H%M%S", time.localtime(time.time()))
+    name = f"{db}_{t}"
+    # /opt/odoo/backups is the host backups directory, nothing is staged in the pod
+    dump = f"{backup_dir}/{name}.dump"
+    filestore = f"{backup_dir}/{name}.filestore.tar.zst"
+    pg_dump = " ".join(
+        [
+            f"PGPASSWORD={shlex.quote(get_odoo_conf('db_password'))}",
+            "pg_dump",
+            f"-h {shlex.quote(get_odoo_conf('db_host'))}",
+            f"-p {shlex.quote(get_odoo_conf('db_port'))}",
+            f"-U {shlex.quote(get_odoo_conf('db_user'))}",
+            f"-Fd -j {jobs} --compress=zstd:{level} --no-owner",
+            f"-f {shlex.quote(dump)}",
+            shlex.quote(db),
+        ]
     )
-    return
+    tar = (
+        f"tar -C {shlex.quote(get_odoo_conf('data_dir'))}/filestore -cf - {shlex.quote(db)}"
+        f" | zstd -T0 -{level} -q -o {shlex.quote(filestore)}"
+    )
+    phases = {"database": (pg_dump, dump), "filestore": (tar, filestore)}
+    print(f"backup {name}")
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(phases)) as pool:
+        futures = {
+            phase: pool.submit(
+                run_timed, ["kubectl", "exec", pod_name, "--", "sh", "-c", script]
+            )
+            for phase, (script, _) in phases.items()
+        }
+    failed = False
+    for phase, future in futures.items():
+        returncode, seconds = future.result()
+        failed = failed or returncode != 0
+        output = os.path.join(
+            project_dir, "backups", os.path.basename(phases[phase][1])
+        )
+        size = path_size(output) if os.path.exists(output) else 0
+        status = "ok" if returncode == 0 else f"failed ({returncode})"
+        print(
+            f"{phase:<10} {status:<12} {seconds:>8.1f}s {size / 2**20:>10.1f} MiB"
+            f" {size / 2**20 / max(seconds, 0.001):>8.1f} MiB/s"
+        )
+    print(f"total      {time.perf_counter() - start_time:>21.1f}s")
+    return int(failed)
 
 
 # ===================
 # restore
+def backup_files_for(bfile):
+    """Host paths of the database dump and filestore archive of a backup"""
+    name = os.path.basename(bfile.rstrip("/"))
+    for suffix in (".dump", ".filestore.tar.zst"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    base = os.path.join(project_dir, "backups", name)
+    return name, f"{base}.dump", f"{base}.filestore.tar.zst"
+
+
+def dump_data_sizes(dump):
+    """Size in bytes of each table data file of a directory format dump, by dump id"""
+    sizes = {}
+    for entry in os.scandir(dump):
+        dump_id = entry.name.split(".")[0]
+        if ".dat" in entry.name and dump_id.isdigit():
+            sizes[dump_id] = entry.stat().st_size
+    return sizes
+
+
+def restore_database(pod_name, db, dump, jobs, progress):
+    """pg_restore a directory format dump, deferring indexes and constraints to the end"""
+    sizes = dump_data_sizes(dump)
+    progress["total"] += sum(sizes.values())
+    conn = " ".join(
+        [
+            f"-h {shlex.quote(get_odoo_conf('db_host'))}",
+            f"-p {shlex.quote(get_odoo_conf('db_port'))}",
+            f"-U {shlex.quote(get_odoo_conf('db_user'))}",
+        ]
+    )
+    source = shlex.quote(f"{backup_dir}/{os.path.basename(dump)}")
+    pg_restore = f"pg_restore {conn} -d {shlex.quote(db)} -j {jobs} --no-owner -v"
+    script = " && ".join(
+        [
+            f"export PGPASSWORD={shlex.quote(get_odoo_conf('db_password'))}",
+            f"dropdb {conn} --if-exists --force {shlex.quote(db)}",
+            f"createdb {conn} {shlex.quote(db)}",
+            # tables and data first, indexes, constraints and triggers last
+            f"{pg_restore} --section=pre-data --section=data {source}",
+            f"{pg_restore} --section=post-data {source}",
+        ]
+    )
+    finished = re.compile(r"finished item (\d+)")
+    start_time = time.perf_counter()
+    proc = subprocess.Popen(
+        ["kubectl", "exec", pod_name, "--", "sh", "-c", script],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    errors = []
+    for line in proc.stdout:
+        match = finished.search(line)
+        if match:
+            progress["done"] += sizes.pop(match.group(1), 0)
+        elif "error" in line.lower():
+            errors.append(line.rstrip())
+    returncode = proc.wait()
+    progress["done"] += sum(sizes.values())
+    for line in errors:
+        print(f"\n{line}", end="")
+    return returncode, time.perf_counter() - start_time
+
+
+def restore_filestore(pod_name, db, archive, progress):
+    """Stream a filestore archive into the pod and unpack it as the filestore of db"""
+    progress["total"] += os.path.getsize(archive)
+    target = shlex.quote(f"{get_odoo_conf('data_dir')}/filestore/{db}")
+    script = (
+        f"rm -rf {target} && mkdir -p {target}"
+        f" && zstd -dc -q | tar -C {target} --strip-components=1 -xf -"
+    )
+    start_time = time.perf_counter()
+    proc = subprocess.Popen(
+        ["kubectl", "exec", "--stdin", pod_name, "--", "sh", "-c", script],
+        stdin=subprocess.PIPE,
+    )
+    try:
+        with open(archive, "rb") as f:
+            for chunk in iter(lambda: f.read(2**20), b""):
+                proc.stdin.write(chunk)
+                progress["done"] += len(chunk)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    return proc.wait(), time.perf_counter() - start_time
+
+
+def show_progress(progress, stop):
+    """Print bytes restored until stop is set"""
+    while not stop.wait(0.5):
+        done, total = progress["done"], max(progress["total"], 1)
+        print(
+            f"\r{done / 2**20:>10.1f} / {total / 2**20:.1f} MiB"
+            f" {100 * done / total:>5.1f}%",
+            end="",
+            flush=True,
+        )
+
+
 @check_project
-def restore(backup_files):
+def restore(backup_files, jobs=4):
     """Restore from backup file"""
-    # TODO: restore
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
     files = parse_multi(backup_files)
-    print(f"restore {files}")
-    project = os.path.basename(CWD)
+    project = project_name()
     pod_name = get_pod(project)
+    if pod_name is None:
+        return 1
+    # a single backup replaces the project database, several get a database each
+    tasks = []
+    missing = False
     for bfile in files:
-        print(pod_name, bfile)
-        # subprocess.run(
-        #     [
-        #         "kubectl",
-        #         "exec",
-        #         "--stdin",
-        #         "--tty",
-        #         pod_name,
-        #         "--",
-        #         "oda_db.py",
-        #         "-r",
-        #         "-d",
-        #         os.path.join("/opt/odoo/backups/", bfile),
-        #     ],
-        #     check=True,
-        # )
-    return
+        name, dump, archive = backup_files_for(bfile)
+        db = get_odoo_conf("db_name") if len(files) == 1 else name
+        if not os.path.isdir(dump):
+            print(f"{name}: backup {dump} not found")
+            missing = True
+            continue
+        print(f"restore {name} into {db}")
+        tasks.append((name, "database", restore_database, (pod_name, db, dump, jobs)))
+        if os.path.exists(archive):
+            tasks.append(
+                (name, "filestore", restore_filestore, (pod_name, db, archive))
+            )
+    if not tasks:
+        return 1
+    progress = {"done": 0, "total": 0}
+    stop = threading.Event()
+    reporter = threading.Thread(target=show_progress, args=(progress, stop))
+    start_time = time.perf_counter()
+    reporter.start()
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        futures = [
+            (name, phase, pool.submit(func, *args, progress))
+            for name, phase, func, args in tasks
+        ]
+    stop.set()
+    reporter.join()
+    print()
+    failed = missing
+    for name, phase, future in futures:
+        returncode, seconds = future.result()
+        failed = failed or returncode != 0
+        status = "ok" if returncode == 0 else f"failed ({returncode})"
+        print(f"{name:<32} {phase:<10} {status:<12} {seconds:>8.1f}s")
+    print(
+        f"total {progress['total'] / 2**20:>48.1f} MiB {time.perf_counter() - start_time:>8.1f}s"
+    )
+    return int(failed)
 
 
 # ===================
-# admin
-# admin user
-@check_project
-def admin_username():
-    """Set Admin username"""
-    username = input("Please enter  the new admin username: ").strip()
-    user2 = input("Please verify the new admin username: ").strip()
-    if username != user2:
-        print("usernames entered do not match")
-        return
-
-    db = get_odoo_conf("db_name")
-    subprocess.run(
-        [
-            "kubectl",
-            "exec",
-            "--stdin",
-            "--tty",
-            "postgres-0",
-            "--",
-            "/usr/local/bin/psql",
-            "-U",
-            "postgres",
-            db,
-            "-c",
-            f"""update res_users set login='{username}' where id=2;""",
-        ],
-        check=True,
+# snapshot
+def psql_admin(*statements):
+    """Run SQL statements as the postgres superuser, stopping at the first error"""
+    command = ["/usr/local/bin/psql", "-U", "postgres", "-v", "ON_ERROR_STOP=1"]
+    for statement in statements:
+        command.extend(["-c", statement])
+    return pod_exec("postgres-0", command)[0]
+
+
+def psql_value(statement):
+    """Get a single value as the postgres superuser"""
+    command = ["/usr/local/bin/psql", "-U", "postgres", "-tAc", statement]
+    return pod_exec("postgres-0", command, echo=False)[1].strip()
+
+
+def clone_database(src, dst, owner=None):
+    """Copy a database with CREATE DATABASE ... TEMPLATE"""
+    # a template copy is a file level copy, the source must have no sessions
+    create = f'CREATE DATABASE "{dst}" TEMPLATE "{src}"'
+    if owner:
+        create += f' OWNER "{owner}"'
+    returncode = psql_admin(
+        f'ALTER DATABASE "{src}" ALLOW_CONNECTIONS false',
+        "SELECT pg_terminate_backend(pid) FROM pg_stat_activity"
+        f" WHERE datname = '{src}'",
+        create,
+    )
+    psql_admin(f'ALTER DATABASE "{src}" ALLOW_CONNECTIONS true')
+    return returncode
+
+
+def cow_copy(src, dst):
+    """Copy a tree with reflinks, falling back to a plain copy"""
+    # reflinked files share blocks until written, a hardlink would share the file
+    returncode = subprocess.run(
+        ["cp", "-a", "--reflink=auto", src, dst], check=False
+    ).returncode
+    if returncode != 0:
+        rmtree(dst, ignore_errors=True)
+    return returncode
+
+
+def snapshot_db(project, name):
+    """Template database name of a snapshot"""
+    # postgres folds and truncates names, the hash keeps every snapshot apart
+    digest = hashlib.sha256(f"{project}/{name}".encode()).hexdigest()[:8]
+    prefix = re.sub(r"[^a-z0-9_]", "_", f"snap_{project}_{name}".lower())[:54]
+    return f"{prefix}_{digest}"
+
+
+def drop_snapshot(snapshot):
+    """Drop the template database and filestore of a snapshot"""
+    db = snapshot["db_name"]
+    psql_admin(
+        f'ALTER DATABASE "{db}" IS_TEMPLATE false',
+        f'DROP DATABASE IF EXISTS "{db}"',
+    )
+    rmtree(
+        os.path.join(snapshots_dir, snapshot["project"], snapshot["name"]),
+        ignore_errors=True,
     )
+    with registry() as conn:
+        conn.execute(
+            "DELETE FROM snapshots WHERE project = ? AND name = ?",
+            (snapshot["project"], snapshot["name"]),
+        )
+    return
+
+
+def evict_snapshots(budget, keep):
+    """Drop least recently used snapshots until they fit in the disk budget"""
+    snapshots = registry().execute("SELECT * FROM snapshots ORDER BY used").fetchall()
+    total = sum(snapshot["size"] for snapshot in snapshots)
+    for snapshot in snapshots:
+        if total <= budget:
+            break
+        if (snapshot["project"], snapshot["name"]) == keep:
+            continue
+        print(f"evict {snapshot['project']}/{snapshot['name']}")
+        drop_snapshot(snapshot)
+        total -= snapshot["size"]
     return
 
 
-# admin password
 @check_project
-def admin_password():
-    """Set Admin password"""
-    if not are_you_sure("change the admin password"):
-        return
-    pass1 = input("Please enter  the admin password: ").strip()
-    pass2 = input("Please verify the admin password: ").strip()
-    if pass1 != pass2:
-        print("passwords entered do not match")
-        return
-    password = change_password(pass1).strip()
+def snapshot_save(name, budget=snapshot_budget):
+    """Save the database and filestore as a snapshot"""
+    project = project_name()
     db = get_odoo_conf("db_name")
-    subprocess.run(
-        [
-            "kubectl",
-            "exec",
-            "--stdin",
-            "--tty",
-            "postgres-0",
-            "--",
-            "/usr/local/bin/psql",
-            "-U",
-            "postgres",
-            db,
-            "-c",
-            f"""update res_users set password='{password}' where id=2;""",
-        ],
-        check=True,
+    snap_db = snapshot_db(project, name)
+    snapshot = (
+        registry()
+        .execute(
+            "SELECT * FROM snapshots WHERE project = ? AND name = ?", (project, name)
+        )
+        .fetchone()
+    )
+    if snapshot is not None:
+        drop_snapshot(snapshot)
+    start_time = time.perf_counter()
+    returncode = clone_database(db, snap_db) or psql_admin(
+        f'ALTER DATABASE "{snap_db}" IS_TEMPLATE true ALLOW_CONNECTIONS false'
+    )
+    if returncode != 0:
+        psql_admin(f'DROP DATABASE IF EXISTS "{snap_db}"')
+        print(f"snapshot {name} failed")
+        return 1
+    path = os.path.join(snapshots_dir, project, name)
+    os.makedirs(path, exist_ok=True)
+    filestore = os.path.join(CWD, "data", "filestore", db)
+    if os.path.exists(filestore) and cow_copy(
+        filestore, os.path.join(path, "filestore")
+    ):
+        psql_admin(
+            f'ALTER DATABASE "{snap_db}" IS_TEMPLATE false',
+            f'DROP DATABASE IF EXISTS "{snap_db}"',
+        )
+        rmtree(path, ignore_errors=True)
+        print(f"copying the filestore failed, snapshot {name} is not saved")
+        return 1
+    size = int(psql_value(f"SELECT pg_database_size('{snap_db}')") or 0)
+    size += path_size(path)
+    now = time.time()
+    with registry() as conn:
+        conn.execute(
+            "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+            (project, name, snap_db, size, now, now),
+        )
+    print(
+        f"snapshot {name} saved {size / 2**20:.1f} MiB"
+        f" in {time.perf_counter() - start_time:.1f}s"
+    )
+    evict_snapshots(budget, (project, name))
+    return 0
+
+
+@check_project
+def snapshot_restore(name):
+    """Restore the database and filestore from a snapshot"""
+    project = project_name()
+    db = get_odoo_conf("db_name")
+    snapshot = (
+        registry()
+        .execute(
+            "SELECT * FROM snapshots WHERE project = ? AND name = ?", (project, name)
+        )
+        .fetchone()
+    )
+    if snapshot is None:
+        print(f"no snapshot {name}")
+        return 1
+    start_time = time.perf_counter()
+    stop()
+    returncode = psql_admin(
+        f'DROP DATABASE IF EXISTS "{db}" WITH (FORCE)',
+        f'CREATE DATABASE "{db}" TEMPLATE "{snapshot["db_name"]}"'
+        f' OWNER "{get_odoo_conf("db_user")}"',
+    )
+    if returncode != 0:
+        print(f"restoring snapshot {name} failed, {project} is left stopped")
+        return 1
+    filestore = os.path.join(CWD, "data", "filestore", db)
+    rmtree(filestore, ignore_errors=True)
+    saved = os.path.join(snapshots_dir, project, name, "filestore")
+    if os.path.exists(saved):
+        os.makedirs(os.path.dirname(filestore), exist_ok=True)
+        if cow_copy(saved, filestore):
+            print(f"restoring the filestore failed, {project} is left stopped")
+            return 1
+    with registry() as conn:
+        conn.execute(
+            "UPDATE snapshots SET used = ? WHERE project = ? AND name = ?",
+            (time.time(), project, name),
+        )
+    start()
+    print(f"snapshot {name} restored in {time.perf_counter() - start_time:.1f}s")
+    return 0
+
+
+@check_project
+def snapshot_list():
+    """List the snapshots of the project"""
+    snapshots = (
+        registry()
+        .execute(
+            "SELECT * FROM snapshots WHERE project = ? ORDER BY created",
+            (project_name(),),
+        )
+        .fetchall()
+    )
+    print(f"{'name':<24} {'size':>12} {'age':>10} {'last used':>10}")
+    for snapshot in snapshots:
+        print(
+            f"{snapshot['name']:<24} {snapshot['size'] / 2**20:>8.1f} MiB"
+            f" {format_age(snapshot['created']):>10} {format_age(snapshot['used']):>10}"
+        )
+    return
+
+
+@check_project
+def snapshot_delete(name):
+    """Delete a snapshot"""
+    snapshot = (
+        registry()
+        .execute(
+            "SELECT * FROM snapshots WHERE project = ? AND name = ?",
+            (project_name(), name),
+        )
+        .fetchone()
+    )
+    if snapshot is None:
+        print(f"no snapshot {name}")
+        return 1
+    drop_snapshot(snapshot)
+    return 0
+
+
+def format_age(timestamp):
+    """Human readable age of a timestamp"""
+    seconds = time.time() - timestamp
+    for unit, length in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= length:
+            return f"{int(seconds // length)}{unit}"
+    return f"{int(seconds)}s"
+
+
+# ===================
+# admin
+def admin_databases(pattern=None):
+    """Databases of the registered projects matching pattern, or of the current project"""
+    from fnmatch import fnmatch
+
+    if pattern is None:
+        return [get_odoo_conf("db_name")]
+    return [
+        project["db_name"]
+        for project in registry().execute("SELECT * FROM projects ORDER BY name")
+        if pattern == "all" or fnmatch(project["name"], pattern)
+    ]
+
+
+def set_user_field(field, value, logins=None, databases=None):
+    """Set a res_users column for the admin user or the given logins, one transaction per database"""
+    from psycopg2 import sql
+
+    # id 2 is the admin user odoo creates with every database
+    where = "id = 2" if not logins else "login = ANY(%(logins)s)"
+    statement = sql.SQL("UPDATE res_users SET {} = %(value)s WHERE " + where).format(
+        sql.Identifier(field)
+    )
+    for db in databases or admin_databases():
+        try:
+            count = db_execute(statement, {"value": value, "logins": logins}, db)
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"{db}: {e}")
+            continue
+        print(f"{db}: {count} users updated")
+    return
+
+
+# admin user
+@check_project
+def admin_username():
+    """Set Admin username"""
+    username = input("Please enter  the new admin username: ").strip()
+    user2 = input("Please verify the new admin username: ").strip()
+    if username != user2:
+        print("usernames entered do not match")
+        return
+
+    set_user_field("login", username)
+    return
+
+
+# admin password
+def read_passwords(csv_file, rounds=None, jobs=None):
+    """Hash the login,password rows of a CSV file in a process pool"""
+    import csv
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    with open(csv_file, "r", encoding="UTF-8", newline="") as f:
+        rows = [
+            (row["login"].strip(), row["password"])
+            for row in csv.DictReader(f)
+            if row.get("login") and row.get("password", "").strip()
+        ]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(partial(hash_login, rounds=rounds), rows, chunksize=16))
+
+
+@check_project
+def admin_password(logins=None, projects=None, rounds=None, from_csv=None):
+    """Set Admin password"""
+    if not are_you_sure("change the admin password"):
+        return
+    if from_csv:
+        start_time = time.perf_counter()
+        hashed = read_passwords(from_csv, rounds)
+        print(
+            f"hashed {len(hashed)} passwords in {time.perf_counter() - start_time:.1f}s"
+        )
+        for db in admin_databases(projects):
+            try:
+                db_execute_many(
+                    "UPDATE res_users SET password = %s WHERE login = %s", hashed, db
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"{db}: {e}")
+                continue
+            print(f"{db}: {len(hashed)} passwords set")
+        return
+    pass1 = input("Please enter  the admin password: ").strip()
+    pass2 = input("Please verify the admin password: ").strip()
+    if pass1 != pass2:
+        print("passwords entered do not match")
+        return
+    password = change_password(pass1, rounds).strip()
+    set_user_field(
+        "password",
+        password,
+        parse_multi(logins) if logins else None,
+        admin_databases(projects),
     )
     return
 
@@ -925,31 +2286,16 @@ def gen_odoo_conf(dbname, epoch, enterprise=True):
 def write_odoo_conf(file, project_name, edition):
     """Write Odoo Configfile"""
     t = time.strftime("%Y%m%d%H%M%S", time.localtime(time.time()))
-    with open(file, "w", encoding="UTF-8") as odoo_conf:
-        if edition == "community":
-            oconf = gen_odoo_conf(project_name, epoch=t, enterprise=False)
-        else:
-            oconf = gen_odoo_conf(project_name, epoch=t, enterprise=True)
-        odoo_conf.write("[options]" + "\n")
-        for k, v in oconf.items():
-            odoo_conf.write(f"{k} = {v}" + "\n")
-    return
+    if edition == "community":
+        oconf = gen_odoo_conf(project_name, epoch=t, enterprise=False)
+    else:
+        oconf = gen_odoo_conf(project_name, epoch=t, enterprise=True)
+    save_odoo_conf(file, oconf)
+    return oconf["db_name"]
 
 
-def project_setup(edition, version, project_name):
-    """Project Config Setup"""
-    if os.path.exists(os.path.join(project_dir, project_name)):
-        print(f"project {project_name} already exists")
-        return
-    os.makedirs(os.path.join(project_dir, project_name))
-    for pdir in ["addons", "conf", "data"]:
-        os.makedirs(os.path.join(project_dir, project_name, pdir))
-    # odoo.conf
-    write_odoo_conf(
-        os.path.join(project_dir, project_name, "conf", "odoo.conf"),
-        project_name,
-        edition,
-    )
+def gen_project(project_name, version):
+    """Generate the project manifest objects"""
     vers = version.replace(".", "-")
     volumes = [
         {"name": "conf", "acl": "ReadOnlyMany", "size": "1Mi"},
@@ -976,29 +2322,55 @@ def project_setup(edition, version, project_name):
             "pathtype": "Prefix",
         },
     ]
-    with open(
-        os.path.join(project_dir, project_name, f"{project_name}.yaml"),
-        "w",
-        encoding="UTF-8",
-    ) as manifest:
-        for vol in volumes:
-            name, acl, size = vol.items()
-            manifest.write(
-                gen_pv(
-                    f"{project_name}-{name[1]}",
-                    acl[1],
-                    size[1],
-                    os.path.join(project_dir, project_name, name[1]),
-                )
-            )
-            manifest.write(gen_pvc(f"{project_name}-{name[1]}", acl[1], size[1]))
-        manifest.write(
-            gen_deployment(
-                project_name, container_image, [8069, 8072], volumes, global_vols
-            )
+    graph = {}
+    for vol in volumes:
+        name, acl, size = vol.items()
+        add_objects(
+            graph,
+            gen_pv(
+                f"{project_name}-{name[1]}",
+                acl[1],
+                size[1],
+                os.path.join(project_dir, project_name, name[1]),
+            ),
+            gen_pvc(f"{project_name}-{name[1]}", acl[1], size[1]),
         )
-        manifest.write(gen_service(project_name, [["odoo", 8069], ["websocket", 8072]]))
-        manifest.write(gen_ingress(project_name, port_list))
+    add_objects(
+        graph,
+        gen_deployment(
+            project_name, container_image, [8069, 8072], volumes, global_vols
+        ),
+        gen_service(project_name, [["odoo", 8069], ["websocket", 8072]]),
+        gen_ingress(project_name, port_list),
+    )
+    return graph
+
+
+def project_setup(edition, version, project_name):
+    """Project Config Setup"""
+    if os.path.exists(os.path.join(project_dir, project_name)):
+        print(f"project {project_name} already exists")
+        return
+    os.makedirs(os.path.join(project_dir, project_name))
+    for pdir in ["addons", "conf", "data"]:
+        os.makedirs(os.path.join(project_dir, project_name, pdir))
+    # odoo.conf
+    db_name = write_odoo_conf(
+        os.path.join(project_dir, project_name, "conf", "odoo.conf"),
+        project_name,
+        edition,
+    )
+    write_manifest(
+        os.path.join(project_dir, project_name, f"{project_name}.yaml"),
+        gen_project(project_name, version),
+    )
+    register_project(
+        project_name,
+        os.path.join(project_dir, project_name),
+        version,
+        edition,
+        db_name,
+    )
     return
 
 
@@ -1011,23 +2383,71 @@ def project_init(edition, version, projectname):
 
 
 # project branch
-def project_branch(edition, version, projectname, branch, url):
+def project_branch(
+    edition, version, projectname, branch, url, options=None, cache=True
+):
     """Initialize Project"""
     project_name = f"{projectname}" if branch == "" else f"{projectname}-{branch}"
     project_setup(edition, version, project_name)
-    Repo.clone_from(
+    options = dict(options or {})
+    if branch != "":
+        options["branch"] = branch
+    # origin stays the project url so pushes go upstream, not to the mirror
+    clone_repo(
         url,
         os.path.join(project_dir, project_name, "addons"),
-        branch=branch,
+        options,
+        cache,
+        upstream=True,
     )
     return
 
 
+# project list
+def deployment_status():
+    """Get the status of every Deployment in one call"""
+    try:
+        deployments = apps_v1().list_namespaced_deployment(namespace)
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"cluster unavailable: {e}")
+        return None
+    return {
+        deployment.metadata.name: (
+            "running" if deployment.status.ready_replicas else "starting"
+        )
+        for deployment in deployments.items
+    }
+
+
+def project_list():
+    """List registered projects and their status"""
+    projects = registry().execute("SELECT * FROM projects ORDER BY name").fetchall()
+    status = deployment_status()
+    print(
+        f"{'name':<24} {'version':<8} {'edition':<11} {'port':<5} {'db_name':<32} status"
+    )
+    for project in projects:
+        if not os.path.exists(project["path"]):
+            state = "missing"
+        elif status is None:
+            state = "unknown"
+        else:
+            state = status.get(project["name"], "stopped")
+        print(
+            f"{project['name']:<24} {project['version']:<8} {project['edition']:<11}"
+            f" {project['port']:<5} {project['db_name']:<32} {state}"
+        )
+    return
+
+
 # project reset
 @check_project
 def project_reset():
     """Project Reset: drop database and clear the data directory"""
-    project = os.path.basename(CWD)
+    import psycopg2
+    from psycopg2 import sql
+
+    project = project_name()
     db = get_odoo_conf("db_name")
     if not are_you_sure("reset the project"):
         return
@@ -1036,101 +2456,332 @@ def project_reset():
         ["kubectl", "delete", "-f", os.path.join(CWD, f"{project}.yaml")],
         check=False,
     )
+    forget_pod(project)
     # rm -rf data/*
     rmtree(os.path.join(CWD, "data"), ignore_errors=True)
     os.makedirs(os.path.join(CWD, "data"), exist_ok=True)
-    # drop db
-    subprocess.run(
-        [
-            "kubectl",
-            "exec",
-            "--stdin",
-            "--tty",
-            "postgres-0",
-            "--",
-            "/usr/local/bin/dropdb",
-            "-U",
-            "postgres",
-            db,
-        ],
-        check=False,
-    )
-    return
+    # drop db: not in a transaction and not from the database itself, the
+    # stopping pod may still hold connections
+    try:
+        db_execute(
+            sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(
+                sql.Identifier(db)
+            ),
+            dbname="postgres",
+            autocommit=True,
+        )
+    except psycopg2.Error as e:
+        print(f"dropping {db} failed: {e}")
+        return 1
+    return 0
 
 
 # project rebuild
 @check_project
-def project_rebuild():
+def project_rebuild(source):
     """Rebuild project with db and filestore of another project but with current addons"""
-    print("project_rebuild")
-    # TODO: project rebuild from one project to current project
+    project = project_name()
+    src = (
+        registry()
+        .execute("SELECT * FROM projects WHERE name = ?", (source,))
+        .fetchone()
+    )
+    if src is None or src["name"] == project:
+        print(f"{source} is not another registered project")
+        return 1
+    if not are_you_sure(f"replace the database and filestore with those of {source}"):
+        return
+    old_db = get_odoo_conf("db_name")
+    t = time.strftime("%Y%m%d%H%M%S", time.localtime(time.time()))
+    db = f"{project.replace('-', '_')}_{t}"
+    start_time = time.perf_counter()
     # stop instance
-    # rm -rf data/*
-    # drop db
-    # copy files
+    stop()
     # clone db
-    return
+    returncode = clone_database(src["db_name"], db, get_odoo_conf("db_user"))
+    if returncode != 0:
+        print(f"cloning {src['db_name']} failed, {project} is left stopped")
+        return 1
+    # copy files
+    filestore = os.path.join(src["path"], "data", "filestore", src["db_name"])
+    new_filestore = os.path.join(CWD, "data", "filestore", db)
+    os.makedirs(os.path.dirname(new_filestore), exist_ok=True)
+    if os.path.exists(filestore) and cow_copy(filestore, new_filestore):
+        # nothing points at the clone yet, the project keeps its old database
+        psql_admin(f'DROP DATABASE IF EXISTS "{db}" WITH (FORCE)')
+        print(f"copying the filestore of {source} failed, {project} is unchanged")
+        start()
+        return 1
+    set_odoo_conf("db_name", db)
+    with registry() as conn:
+        conn.execute("UPDATE projects SET db_name = ? WHERE path = ?", (db, CWD))
+    # drop db: only once odoo.conf and the registry point at the clone
+    psql_admin(f'DROP DATABASE IF EXISTS "{old_db}" WITH (FORCE)')
+    rmtree(os.path.join(CWD, "data", "filestore", old_db), ignore_errors=True)
+    start()
+    print(
+        f"{project} rebuilt from {source} as {db}"
+        f" in {time.perf_counter() - start_time:.1f}s"
+    )
+    return 0
 
 
 # ===================
 # repo
 # repo base
 # repo base clone
-def repo_base_clone():
+def clone_options(depth=None, blob_filter=None, single_branch=False):
+    """Get the git clone options for shallow, partial and single-branch clones"""
+    options = {}
+    if depth:
+        options["depth"] = depth
+    if blob_filter:
+        options["filter"] = blob_filter
+    if single_branch:
+        options["single_branch"] = True
+    return options
+
+
+def mirror_path(url):
+    """Get the local mirror path of a repository url"""
+    name = re.sub(r"^[a-z+]+://|^[^/@]+@", "", url).rstrip("/")
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    if not name.endswith(".git"):
+        name = f"{name}.git"
+    return os.path.join(mirrors_dir, name)
+
+
+def refresh_mirror(path):
+    """Fetch a local mirror from its upstream"""
+    from git import Repo
+
+    Repo(path).git.fetch("--prune", "origin")
+    Path(path, "oda-refreshed").touch()
+    return
+
+
+def refresh_mirrors(jobs=4):
+    """Refresh every local mirror concurrently"""
+    if not os.path.exists(mirrors_dir):
+        return
+    run_repo_tasks(
+        [
+            [
+                (name, refresh_mirror, os.path.join(mirrors_dir, name))
+                for name in sorted(os.listdir(mirrors_dir))
+            ]
+        ],
+        jobs,
+    )
+    return
+
+
+def refresh_mirrors_background():
+    """Refresh the local mirrors in a detached oda process"""
+    subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, os.path.abspath(__file__), "repo", "mirror", "refresh"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return
+
+
+def get_mirror(url):
+    """Get the local mirror of a repository url, creating it if needed"""
+    from git import Repo
+
+    path = mirror_path(url)
+    if not os.path.exists(path):
+        os.makedirs(mirrors_dir, exist_ok=True)
+        Repo.clone_from(url, path, mirror=True)
+        # clones borrow objects from the mirror, so never prune them
+        Repo(path).git.config("gc.pruneExpire", "never")
+        Path(path, "oda-refreshed").touch()
+        return path
+    stamp = os.path.join(path, "oda-refreshed")
+    if (
+        not os.path.exists(stamp)
+        or time.time() - os.path.getmtime(stamp) > mirror_max_age
+    ):
+        refresh_mirrors_background()
+    return path
+
+
+def clone_repo(url, path, options=None, cache=True, upstream=False):
+    """Clone a repository url through its local mirror"""
+    from git import Repo
+    from git.exc import GitCommandError
+
+    options = dict(options or {})
+    # the mirror holds the full history, so shallow and partial clones skip it
+    if cache and ("depth" in options or "filter" in options):
+        print(f"--depth/--filter bypass the mirror cache, cloning {url} from upstream")
+        cache = False
+    if not cache:
+        return Repo.clone_from(url, path, **options)
+    mirror = get_mirror(url)
+    try:
+        repo = Repo.clone_from(mirror, path, shared=True, **options)
+    except GitCommandError:
+        # the branch may be newer than the mirror
+        rmtree(path, ignore_errors=True)
+        refresh_mirror(mirror)
+        repo = Repo.clone_from(mirror, path, shared=True, **options)
+    if upstream:
+        repo.remotes.origin.set_url(url)
+    return repo
+
+
+def repo_base_clone(options=None, cache=True):
     """repo base clone"""
     print("repo base clone")
     if not os.path.exists(repo_dir):
         os.makedirs(repo_dir)
-    # community
-    if os.path.exists(os.path.join(repo_dir, "odoo", ".git")):
-        print("odoo community already exists")
-    else:
-        repo_url = "https://github.com/odoo/odoo"
-        Repo.clone_from(repo_url, os.path.join(repo_dir, "odoo"))
-    # enterprise
-    if os.path.exists(os.path.join(repo_dir, "enterprise", ".git")):
-        print("odoo enterprise already exists")
-    else:
-        repo_url = "https://github.com/odoo/enterprise"
-        Repo.clone_from(repo_url, os.path.join(repo_dir, "odoo"))
+    for name, repo_url in base_repos.items():
+        if os.path.exists(os.path.join(repo_dir, name, ".git")):
+            print(f"odoo {name} already exists")
+        else:
+            clone_repo(repo_url, os.path.join(repo_dir, name), options, cache)
     return
 
 
 # repo base update
-def repo_base_update():
-    """repo base update"""
-    # community
-    repo = Repo(os.path.join(repo_dir, "odoo"))
-    for remote in repo.remotes:
-        remote.fetch()
+def default_branch(repo):
+    """Get the remote default branch of a repo"""
     refs = [
         ref.reference.name
         for ref in repo.remotes.origin.refs
         if ref.name == "origin/HEAD"
     ]
     branch_ref = refs[0] if len(refs) > 0 else ""
-    branch = branch_ref.split("/")[1] if len(branch_ref.split("/")) == 2 else ""
-    repo.git.checkout(branch)
-    repo.remotes.origin.pull()
-    # enterprise
-    repo = Repo(os.path.join(repo_dir, "enterprise"))
+    return branch_ref.split("/")[1] if len(branch_ref.split("/")) == 2 else ""
+
+
+def fetch_repo(path):
+    """Fetch every remote of a repo"""
+    from git import Repo
+
+    repo = Repo(path)
     for remote in repo.remotes:
         remote.fetch()
-    refs = [
-        ref.reference.name
-        for ref in repo.remotes.origin.refs
-        if ref.name == "origin/HEAD"
+    return
+
+
+def mirror_tasks(paths):
+    """Get the refresh tasks of the local mirrors that repos fetch from"""
+    from git import Repo
+
+    mirrors = set()
+    for path in paths:
+        if os.path.exists(path):
+            for remote in Repo(path).remotes:
+                if remote.url.startswith(mirrors_dir):
+                    mirrors.add(remote.url)
+    return [
+        (os.path.basename(mirror), refresh_mirror, mirror) for mirror in sorted(mirrors)
     ]
-    branch_ref = refs[0] if len(refs) > 0 else ""
-    branch = branch_ref.split("/")[1] if len(branch_ref.split("/")) == 2 else ""
+
+
+def fast_forward(path, branch=None):
+    """Checkout branch, the remote default branch if None, and fast-forward it"""
+    from git import Repo
+
+    repo = Repo(path)
+    if branch is None:
+        branch = default_branch(repo)
     repo.git.checkout(branch)
-    repo.remotes.origin.pull()
+    repo.git.merge("--ff-only", f"origin/{branch}")
+    return
+
 
+def update_repo(path, branch=None):
+    """Fetch a repo and fast-forward branch"""
+    fetch_repo(path)
+    fast_forward(path, branch)
+    return
+
+
+def is_worktree(path):
+    """Check if path is a git worktree sharing a base repo"""
+    return os.path.isfile(os.path.join(path, ".git"))
+
+
+def run_repo_tasks(phases, jobs=4):
+    """Run phases of repo tasks, each phase concurrently, and summarize timings"""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    def timed(func, *args):
+        start_time = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start_time
+
+    total = sum(len(phase) for phase in phases)
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for phase in phases:
+            futures = {
+                pool.submit(timed, func, *args): label for label, func, *args in phase
+            }
+            for future in as_completed(futures):
+                label = futures[future]
+                try:
+                    seconds = future.result()
+                    status = "updated"
+                except Exception as e:  # pylint: disable=broad-except
+                    seconds = 0.0
+                    status = f"failed: {e}".splitlines()[0]
+                results.append((label, status, seconds))
+                print(f"[{len(results)}/{total}] {label} {status} {seconds:.1f}s")
+    print()
+    for label, status, seconds in sorted(results):
+        print(f"{label:<24} {seconds:>7.1f}s  {status}")
+    return
+
+
+def repo_base_update(jobs=4):
+    """repo base update"""
+    paths = [os.path.join(repo_dir, name) for name in base_repos]
+    run_repo_tasks(
+        [
+            mirror_tasks(paths),
+            [
+                (os.path.basename(path), update_repo, path)
+                for path in paths
+                if os.path.exists(path)
+            ],
+        ],
+        jobs,
+    )
     return
 
 
 # repo branch
 # repo branch clone
+def add_worktree(base, path, version):
+    """Check out a version of a base repo as a git worktree"""
+    from git import Repo
+
+    repo = Repo(base)
+    repo.git.worktree("prune")
+    # single-branch base repos only fetch their own branch, track this one too
+    refspec = f"+refs/heads/{version}:refs/remotes/origin/{version}"
+    refspecs = repo.git.config("--get-all", "remote.origin.fetch").splitlines()
+    if refspec not in refspecs and not any("*" in spec for spec in refspecs):
+        repo.git.config("--add", "remote.origin.fetch", refspec)
+    options = {}
+    if os.path.exists(os.path.join(repo.git_dir, "shallow")):
+        options["depth"] = 1
+    repo.remotes.origin.fetch(refspec, **options)
+    if version in repo.heads:
+        # --force allows the branch to also be checked out in the base repo
+        repo.git.worktree("add", "--force", path, version)
+    else:
+        repo.git.worktree("add", "--track", "-b", version, path, f"origin/{version}")
+    return
+
+
 def repo_branch_clone(version):
     """repo branch clone"""
     # branch
@@ -1139,65 +2790,208 @@ def repo_branch_clone(version):
     else:
         branch_dir = os.path.join(repo_dir, version)
         os.makedirs(branch_dir)
-    # community
-    if not os.path.exists(os.path.join(repo_dir, version, "odoo")):
-        copytree(
-            os.path.join(repo_dir, "odoo"),
-            os.path.join(repo_dir, version, "odoo"),
-        )
-        repo = Repo(os.path.join(repo_dir, version, "odoo"))
-        repo.git.checkout(version)
-        repo.remotes.origin.pull()
-    # enterprise
-    if not os.path.exists(os.path.join(repo_dir, version, "enterprise")):
-        copytree(
-            os.path.join(repo_dir, "enterprise"),
-            os.path.join(repo_dir, version, "enterprise"),
-        )
-        repo = Repo(os.path.join(repo_dir, version, "enterprise"))
-        for remote in repo.remotes:
-            remote.fetch()
-        repo.git.checkout(version)
-        repo.remotes.origin.pull()
+    # community and enterprise share the objects of the base repos
+    for name in ["odoo", "enterprise"]:
+        if not os.path.exists(os.path.join(repo_dir, version, name)):
+            add_worktree(
+                os.path.join(repo_dir, name),
+                os.path.join(repo_dir, version, name),
+                version,
+            )
+    # refresh the version index read by shell completion
+    get_current_odoo_repos()
     return
 
 
 # repo branch update
-def repo_branch_update(version):
+def version_tasks(version):
+    """Get the base fetch and version update tasks of a version checkout"""
+    fetches = []
+    updates = []
+    for name in ["odoo", "enterprise"]:
+        path = os.path.join(repo_dir, version, name)
+        if not os.path.exists(path):
+            continue
+        if is_worktree(path):
+            # the base repo fetch brings in the refs the worktree needs
+            fetches.append(name)
+            updates.append((f"{version}/{name}", fast_forward, path, version))
+        else:
+            updates.append((f"{version}/{name}", update_repo, path, version))
+    return fetches, updates
+
+
+def repo_branch_update(version, jobs=4):
     """repo branch update"""
     if not os.path.exists(os.path.join(repo_dir, version)):
         print(f"branch {version} does not exist, please clone the branch")
         return
-    # community
-    repo = Repo(os.path.join(repo_dir, "odoo"))
-    for remote in repo.remotes:
-        remote.fetch()
-    repo.git.checkout(version)
-    repo.remotes.origin.pull()
-    # enterprise
-    repo = Repo(os.path.join(repo_dir, "enterprise"))
-    for remote in repo.remotes:
-        remote.fetch()
-    repo.git.checkout(version)
-    repo.remotes.origin.pull()
+    fetches, updates = version_tasks(version)
+    paths = [os.path.join(repo_dir, name) for name in fetches]
+    run_repo_tasks(
+        [
+            mirror_tasks(paths + [task[2] for task in updates]),
+            [(os.path.basename(path), fetch_repo, path) for path in paths],
+            updates,
+        ],
+        jobs,
+    )
+    return
+
+
+# repo update
+def repo_update(update_all=False, jobs=4):
+    """Update the base repos and, with update_all, every version checkout"""
+    bases = [
+        (name, update_repo, os.path.join(repo_dir, name))
+        for name in base_repos
+        if os.path.exists(os.path.join(repo_dir, name))
+    ]
+    updates = []
+    if update_all:
+        for version in sorted(get_current_odoo_repos()):
+            _, version_updates = version_tasks(version)
+            updates.extend(version_updates)
+    clones = bases + [task for task in updates if task[1] is update_repo]
+    # mirrors are refreshed once, then the base repos and other clones fetch
+    # from them, and worktrees only need a fast-forward after that
+    run_repo_tasks(
+        [
+            mirror_tasks([task[2] for task in clones]),
+            clones,
+            [task for task in updates if task[1] is fast_forward],
+        ],
+        jobs,
+    )
+    return
+
+
+# ===================
+# completions
+def completion_tree(parser, path="oda", tree=None):
+    """Walk the parser collecting subcommands, flags and positional choices"""
+    if tree is None:
+        tree = {"children": {}, "flags": {}, "positional": {}}
+    children = []
+    flags = []
+    positional = 0
+    # pylint: disable=protected-access
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            for name, subparser in action.choices.items():
+                children.append(name)
+                completion_tree(subparser, f"{path} {name}", tree)
+        elif action.option_strings:
+            flags.extend(action.option_strings)
+        else:
+            completer = getattr(action, "completer", None)
+            if completer is not None:
+                tree["positional"][f"{path}:{positional}"] = f"@{completer}"
+            elif action.choices:
+                tree["positional"][f"{path}:{positional}"] = " ".join(action.choices)
+            positional += 1
+    tree["children"][path] = " ".join(children)
+    tree["flags"][path] = " ".join(flags)
+    return tree
+
+
+def gen_completions(parser):
+    """Generate the bash completion script"""
+    tree = completion_tree(parser)
+    lines = []
+    for table in ["children", "flags", "positional"]:
+        lines.append(f"declare -gA _oda_{table}=(")
+        for key, value in tree[table].items():
+            lines.append(f'  ["{key}"]="{value}"')
+        lines.append(")")
+    return "\n".join(lines) + f"""
+_oda() {{
+  local cur="${{COMP_WORDS[COMP_CWORD]}}" path="oda" word words i n=0
+  for ((i = 1; i < COMP_CWORD; i++)); do
+    word="${{COMP_WORDS[i]}}"
+    [[ $word == -* ]] && continue
+    if [[ " ${{_oda_children[$path]}} " == *" $word "* ]]; then
+      path="$path $word"
+      n=0
+    else
+      n=$((n + 1))
+    fi
+  done
+  words="${{_oda_positional[$path:$n]}}"
+  if [[ $words == "@versions" ]]; then
+    words="$(cat "{versions_index}" 2>/dev/null)"
+  elif [[ -z $words && $n -eq 0 ]]; then
+    words="${{_oda_children[$path]}}"
+    [[ $cur == -* ]] && words="${{_oda_flags[$path]}}"
+  fi
+  COMPREPLY=($(compgen -W "$words" -- "$cur"))
+}}
+complete -F _oda oda
+"""
+
+
+def completions_show(parser):
+    """Show bash completions"""
+    print(gen_completions(parser))
+    return
+
+
+def completions_install(parser):
+    """Install bash completions"""
+    os.makedirs(os.path.dirname(completions_file), exist_ok=True)
+    with open(completions_file, "w", encoding="UTF-8") as completions:
+        completions.write(gen_completions(parser))
+    print(f"bash completions installed to {completions_file}")
     return
 
 
 class ArgParser(argparse.ArgumentParser):
     """ArgParser modified to output help on error"""
 
+    # set while running a batch, where a bad line must stop the batch
+    raise_errors = False
+
     def error(self, message):
+        if self.raise_errors:
+            raise argparse.ArgumentError(None, message)
         print(f"error: {message}\n")
         self.print_help()
 
 
-def main():
-    """Odoo Administration Tool"""
+def add_clone_arguments(parser):
+    """Add the shallow, partial and single-branch clone arguments"""
+    parser.add_argument(
+        "--depth",
+        type=int,
+        help="shallow clone with N commits, from upstream instead of the mirror",
+    )
+    parser.add_argument(
+        "--filter",
+        dest="blob_filter",
+        help="partial clone filter, e.g. blob:none, from upstream instead of the mirror",
+    )
+    parser.add_argument(
+        "--single-branch", action="store_true", help="clone a single branch"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="clone from upstream instead of the local mirror",
+    )
+
+
+def build_parser():
+    """Build the oda argument parser"""
     parser = ArgParser(
         prog="oda",
         description="Odoo Administration Tool",
         epilog="thanks for using %(prog)s!",
     )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="run the oda commands in FILE, one per line, sharing pod sessions",
+    )
     subparsers = parser.add_subparsers(
         dest="command", title="commands", help="commands"
     )
@@ -1219,6 +3013,25 @@ def main():
 
     # ===================
     # completions   Generate bash completions
+    completions_parser = subparsers.add_parser(
+        "completions", help="Generate bash completions"
+    )
+    completions_subparser = completions_parser.add_subparsers(
+        dest="completions",
+        title="completions",
+        help="Generate bash completions",
+        required=True,
+    )
+
+    # completions show
+    completions_subparser.add_parser(
+        "show", help='Show bash completions, usage: eval "$(oda completions show)"'
+    )
+
+    # completions install
+    completions_subparser.add_parser(
+        "install", help=f"Install bash completions to {completions_file}"
+    )
 
     # ===================
     # kube
@@ -1239,9 +3052,25 @@ def main():
     # kube gen postgres
     postgres_parser = kube_gen_subparser.add_parser("postgres", help="Postgresql Setup")
     postgres_parser.add_argument("version", help="PostgreSQL version")
+    postgres_parser.add_argument(
+        "-f",
+        "--format",
+        choices=manifest_formats,
+        default="yaml",
+        help="manifest format, jsonl skips yaml entirely",
+    )
 
     # kube gen odoo
-    kube_gen_subparser.add_parser("odoo", help="Odoo Volume Manifest")
+    kube_gen_odoo_parser = kube_gen_subparser.add_parser(
+        "odoo", help="Odoo Volume Manifest"
+    )
+    kube_gen_odoo_parser.add_argument(
+        "-f",
+        "--format",
+        choices=manifest_formats,
+        default="yaml",
+        help="manifest format, jsonl skips yaml entirely",
+    )
 
     # kube apply
     kube_apply_parser = kube_subparser.add_parser("apply", help="apply manifest")
@@ -1256,9 +3085,17 @@ def main():
     postgres_parser = kube_apply_subparser.add_parser(
         "postgres", help="Postgresql Start"
     )
+    postgres_parser.add_argument(
+        "-j", "--jobs", type=int, default=8, help="concurrent API requests"
+    )
 
     # kube apply odoo
-    kube_apply_subparser.add_parser("odoo", help="Odoo Volume Start")
+    kube_apply_odoo_parser = kube_apply_subparser.add_parser(
+        "odoo", help="Odoo Volume Start"
+    )
+    kube_apply_odoo_parser.add_argument(
+        "-j", "--jobs", type=int, default=8, help="concurrent API requests"
+    )
 
     # ===================
     # start         Start the instance
@@ -1282,12 +3119,22 @@ def main():
     # app install
     install_parser = app_subparser.add_parser("install", help="Install module(s)")
     install_parser.add_argument("module", help="modules to install", nargs="+")
+    install_parser.add_argument("--log", help="also write the output to LOG")
 
     # app upgrade
     upgrade_parser = app_subparser.add_parser("upgrade", help="Upgrade module(s)")
     upgrade_parser.add_argument(
         "module", help="modules to upgrade", default=["all"], nargs="*"
     )
+    upgrade_parser.add_argument("--log", help="also write the output to LOG")
+    upgrade_parser.add_argument(
+        "--projects",
+        metavar="GLOB",
+        help="upgrade every registered project matching GLOB, or all",
+    )
+    upgrade_parser.add_argument(
+        "-j", "--jobs", type=int, default=4, help="concurrent project upgrades"
+    )
 
     # ===================
     # logs          Follow the logs
@@ -1299,6 +3146,7 @@ def main():
         "scaffold", help="Generates an Odoo module skeleton in addons"
     )
     scaffold_parser.add_argument("module", help="%(prog)s module")
+    scaffold_parser.add_argument("--log", help="also write the output to LOG")
 
     # ===================
     # psql          Access the raw database
@@ -1306,11 +3154,48 @@ def main():
 
     # ===================
     # query         Query the database
-    subparsers.add_parser("query", help="Query the database")
+    query_parser = subparsers.add_parser("query", help="Query the database")
+    query_parser.add_argument(
+        "model", help="odoo model to be queried, or a SELECT statement with --sql"
+    )
+    query_parser.add_argument(
+        "--sql",
+        action="store_true",
+        help="run a read-only SELECT against the project database directly",
+    )
+    query_parser.add_argument("--db_name", help="Database Name")
+    query_parser.add_argument("-U", default="admin", help="Odoo username")
+    query_parser.add_argument("-P", default="admin", help="Odoo password")
+    query_parser.add_argument("--filter", default="[]", help="Model domain filter")
+    query_parser.add_argument("--fields", help="Model fields to show")
+    query_parser.add_argument("--limit", type=int, help="Limit on records returned")
+    query_parser.add_argument(
+        "--offset", type=int, default=0, help="Offset of records returned"
+    )
+    query_parser.add_argument(
+        "--count", action="store_true", help="Count matching records"
+    )
+    query_parser.add_argument(
+        "--format", choices=["ndjson", "csv"], default="ndjson", help="output format"
+    )
+    query_parser.add_argument(
+        "--batch-size", type=int, default=1000, help="records per search_read page"
+    )
+    query_parser.add_argument(
+        "--url", help="Odoo server url, defaults to the project ingress"
+    )
 
     # ===================
     # backup        Backup database filestore and addons
-    subparsers.add_parser("backup", help="Backup database filestore and addons")
+    backup_parser = subparsers.add_parser(
+        "backup", help="Backup database filestore and addons"
+    )
+    backup_parser.add_argument(
+        "-j", "--jobs", type=int, default=4, help="parallel pg_dump jobs"
+    )
+    backup_parser.add_argument(
+        "--level", type=int, default=3, help="zstd compression level"
+    )
 
     # ===================
     # restore       Restore database and filestore or addons
@@ -1318,6 +3203,38 @@ def main():
         "restore", help="Restore database and filestore or addons"
     )
     restore_parser.add_argument("file", help="Path to backup file", nargs="+")
+    restore_parser.add_argument(
+        "-j", "--jobs", type=int, default=4, help="parallel pg_restore jobs"
+    )
+
+    # ===================
+    # snapshot      Instant restore points of the database and filestore
+    snapshot_parser = subparsers.add_parser(
+        "snapshot", help="Instant restore points of the database and filestore"
+    )
+    snapshot_subparser = snapshot_parser.add_subparsers(
+        dest="snapshot",
+        title="snapshot",
+        help="Instant restore points of the database and filestore",
+        required=True,
+    )
+    snapshot_save_parser = snapshot_subparser.add_parser("save", help="save a snapshot")
+    snapshot_save_parser.add_argument("name", help="Snapshot Name")
+    snapshot_save_parser.add_argument(
+        "--budget",
+        type=float,
+        default=snapshot_budget / 2**30,
+        help="GiB kept for snapshots, least recently used are evicted",
+    )
+    snapshot_restore_parser = snapshot_subparser.add_parser(
+        "restore", help="restore a snapshot"
+    )
+    snapshot_restore_parser.add_argument("name", help="Snapshot Name")
+    snapshot_subparser.add_parser("list", help="list snapshots with size and age")
+    snapshot_delete_parser = snapshot_subparser.add_parser(
+        "delete", help="delete a snapshot"
+    )
+    snapshot_delete_parser.add_argument("name", help="Snapshot Name")
 
     # ===================
     # admin         Admin user management
@@ -1330,7 +3247,27 @@ def main():
     admin_subparser.add_parser("username", help="Odoo Admin username")
 
     # admin password
-    admin_subparser.add_parser("password", help="Odoo Admin password")
+    admin_password_parser = admin_subparser.add_parser(
+        "password", help="Odoo Admin password"
+    )
+    admin_password_parser.add_argument(
+        "--users", nargs="+", help="logins to set instead of the admin user"
+    )
+    admin_password_parser.add_argument(
+        "--projects",
+        metavar="GLOB",
+        help="set it in every registered project matching GLOB, or all",
+    )
+    admin_password_parser.add_argument(
+        "--rounds",
+        type=int,
+        help="pbkdf2 rounds, low for throwaway databases, passlib's default otherwise",
+    )
+    admin_password_parser.add_argument(
+        "--from-csv",
+        metavar="FILE",
+        help="set the passwords of a login,password CSV file",
+    )
 
     # ===================
     # project       Project level commands [CAUTION]
@@ -1354,8 +3291,7 @@ def main():
     project_init_parser.add_argument(
         "version",
         help="Odoo Branch",
-        choices=get_current_odoo_repos(),
-    )
+    ).completer = "versions"
     project_init_parser.add_argument("projectname", help="Project Name")
 
     # project branch
@@ -1368,15 +3304,24 @@ def main():
     project_branch_parser.add_argument(
         "version",
         help="Odoo Branch",
-        choices=get_current_odoo_repos(),
-    )
+    ).completer = "versions"
     project_branch_parser.add_argument("projectname", help="Project Name")
     project_branch_parser.add_argument("branch", help="Project Branch")
     project_branch_parser.add_argument("url", help="Project URL")
+    add_clone_arguments(project_branch_parser)
+
+    # project list
+    project_subparser.add_parser("list", help="list projects and their status")
 
     # project reset
     project_subparser.add_parser("reset", help="reset")
 
+    # project rebuild
+    project_rebuild_parser = project_subparser.add_parser(
+        "rebuild", help="clone the database and filestore of another project"
+    )
+    project_rebuild_parser.add_argument("source", help="Source Project Name")
+
     # ===================
     # repo          Odoo community and enterprise repository management
     repo_parser = subparsers.add_parser(
@@ -1389,6 +3334,36 @@ def main():
         required=True,
     )
 
+    # repo update
+    repo_update_parser = repo_subparser.add_parser(
+        "update", help="update the base repositories concurrently"
+    )
+    repo_update_parser.add_argument(
+        "--all", action="store_true", help="also update every version checkout"
+    )
+    repo_update_parser.add_argument(
+        "-j", "--jobs", type=int, default=4, help="concurrent repositories"
+    )
+
+    # repo mirror
+    repo_mirror_parser = repo_subparser.add_parser(
+        "mirror", help="local mirror cache that every clone is made from"
+    )
+    repo_mirror_subparser = repo_mirror_parser.add_subparsers(
+        dest="mirror",
+        title="mirror",
+        help="local mirror cache that every clone is made from",
+        required=True,
+    )
+
+    # repo mirror refresh
+    repo_mirror_refresh_parser = repo_mirror_subparser.add_parser(
+        "refresh", help="fetch every local mirror from upstream"
+    )
+    repo_mirror_refresh_parser.add_argument(
+        "-j", "--jobs", type=int, default=4, help="concurrent repositories"
+    )
+
     # repo base
     repo_base_parser = repo_subparser.add_parser("base", help="base")
     repo_base_subparser = repo_base_parser.add_subparsers(
@@ -1399,7 +3374,10 @@ def main():
     )
 
     # repo base clone
-    repo_base_subparser.add_parser("clone", help="clone the Odoo source repository")
+    repo_base_clone_parser = repo_base_subparser.add_parser(
+        "clone", help="clone the Odoo source repository"
+    )
+    add_clone_arguments(repo_base_clone_parser)
 
     # repo base update
     repo_base_subparser.add_parser("update", help="update the Odoo source repository")
@@ -1426,27 +3404,55 @@ def main():
     repo_branch_update_parser.add_argument("branch", help="branch name")
 
     parser.add_argument("--version", action="version", version=f"%(prog)s {SEMVER}")
-
-    # ===================
-    # process arguments
-    args = parser.parse_args(args=None if sys.argv[1:] else ["--help"])
+    return parser
+
+
+def run_command(parser, args):
+    """Run one parsed oda command"""
+    # versions are checked after parsing so other commands never scan repo_dir
+    if (
+        args.command == "project"
+        and args.project in ["init", "branch"]
+        and args.version not in get_current_odoo_repos()
+    ):
+        parser.error(
+            f"argument version: invalid choice: '{args.version}'"
+            f" (choose from {', '.join(get_current_odoo_repos())})"
+        )
+        return 2
+    # snapshot names end up in database names and paths
+    if (
+        args.command == "snapshot"
+        and args.snapshot in ["save", "restore", "delete"]
+        and not re.fullmatch(r"[A-Za-z0-9_-]+", args.name)
+    ):
+        parser.error(
+            f"argument name: invalid snapshot name: '{args.name}'"
+            " (use letters, digits, _ and -)"
+        )
+        return 2
 
     if args.command == "config":
         if args.config == "vscode":
             config_vscode()
         elif args.config == "pyright":
             config_pyright()
+    elif args.command == "completions":
+        if args.completions == "show":
+            completions_show(parser)
+        elif args.completions == "install":
+            completions_install(parser)
     elif args.command == "kube":
         if args.kube == "gen":
             if args.gen == "postgres" and args.version:
-                kube_gen_postgres(args.version)
+                kube_gen_postgres(args.version, args.format)
             elif args.gen == "odoo":
-                kube_gen_odoo()
+                kube_gen_odoo(args.format)
         elif args.kube == "apply":
             if args.apply == "postgres":
-                kube_apply_postgres()
+                kube_apply_postgres(args.jobs)
             elif args.apply == "odoo":
-                kube_apply_odoo()
+                kube_apply_odoo(args.jobs)
     elif args.command == "start":
         start()
     elif args.command == "stop":
@@ -1455,27 +3461,52 @@ def main():
         restart()
     elif args.command == "app":
         if args.app == "install" and args.module:
-            app_install_upgrade(args.module, install=True)
+            return app_install_upgrade(args.module, install=True, log_file=args.log)
+        elif args.app == "upgrade" and args.module and args.projects:
+            return app_upgrade_projects(args.module, args.projects, args.jobs)
         elif args.app == "upgrade" and args.module:
-            app_install_upgrade(args.module, install=False)
+            return app_install_upgrade(args.module, install=False, log_file=args.log)
     elif args.command == "logs":
         logs()
     elif args.command == "scaffold" and args.module:
         print(args)
-        scaffold(args.module)
+        return scaffold(args.module, args.log)
     elif args.command == "psql":
         psql()
     elif args.command == "query":
-        query()
+        return query(
+            args.model,
+            args.db_name,
+            args.U,
+            args.P,
+            args.filter,
+            args.fields,
+            args.limit,
+            args.offset,
+            args.count,
+            args.format,
+            args.batch_size,
+            args.url,
+            args.sql,
+        )
     elif args.command == "backup":
-        backup()
+        return backup(args.jobs, args.level)
     elif args.command == "restore" and args.file:
-        restore(args.file)
+        return restore(args.file, args.jobs)
+    elif args.command == "snapshot":
+        if args.snapshot == "save":
+            return snapshot_save(args.name, int(args.budget * 2**30))
+        elif args.snapshot == "restore":
+            return snapshot_restore(args.name)
+        elif args.snapshot == "list":
+            snapshot_list()
+        elif args.snapshot == "delete":
+            return snapshot_delete(args.name)
     elif args.command == "admin":
         if args.admin == "username":
             admin_username()
         elif args.admin == "password":
-            admin_password()
+            admin_password(args.users, args.projects, args.rounds, args.from_csv)
     elif args.command == "project":
         print(args.command, args)
         if (
@@ -1494,14 +3525,32 @@ def main():
             and args.url
         ):
             project_branch(
-                args.edition, args.version, args.projectname, args.branch, args.url
+                args.edition,
+                args.version,
+                args.projectname,
+                args.branch,
+                args.url,
+                clone_options(args.depth, args.blob_filter, args.single_branch),
+                cache=not args.no_cache,
             )
+        elif args.project == "list":
+            project_list()
         elif args.project == "reset":
-            project_reset()
+            return project_reset()
+        elif args.project == "rebuild" and args.source:
+            return project_rebuild(args.source)
     elif args.command == "repo":
-        if args.repo == "base":
+        if args.repo == "update":
+            repo_update(args.all, args.jobs)
+        elif args.repo == "mirror":
+            if args.mirror == "refresh":
+                refresh_mirrors(args.jobs)
+        elif args.repo == "base":
             if args.base == "clone":
-                repo_base_clone()
+                repo_base_clone(
+                    clone_options(args.depth, args.blob_filter, args.single_branch),
+                    cache=not args.no_cache,
+                )
             elif args.base == "update":
                 repo_base_update()
         elif args.repo == "branch":
@@ -1511,5 +3560,54 @@ def main():
                 repo_branch_update(args.branch)
 
 
+def run_batch(parser, batch):
+    """Run the oda commands of a batch file, one per line"""
+    with open(batch, "r", encoding="UTF-8") as f:
+        lines = [line.strip() for line in f]
+    for line in lines:
+        if not line or line.startswith("#"):
+            continue
+        print(f"> {line}")
+        ArgParser.raise_errors = True
+        try:
+            args = parser.parse_args(shlex.split(line))
+        except (argparse.ArgumentError, ValueError) as e:
+            print(f"error: {e}")
+            print(f"stopping the batch, {line} is not a valid oda command")
+            return 2
+        except SystemExit:
+            # --help and --version print and exit
+            continue
+        finally:
+            ArgParser.raise_errors = False
+        if args.batch:
+            print("batch files do not nest")
+            continue
+        returncode = run_command(parser, args)
+        if returncode:
+            print(f"stopping the batch, {line} exited with {returncode}")
+            return returncode
+    return 0
+
+
+def main():
+    """Odoo Administration Tool"""
+    parser = build_parser()
+
+    # ===================
+    # process arguments
+    args = parser.parse_args(args=None if sys.argv[1:] else ["--help"])
+
+    # pods are looked up and exec sessions opened once for the whole run
+    try:
+        if args.batch:
+            returncode = run_batch(parser, args.batch)
+        else:
+            returncode = run_command(parser, args)
+    finally:
+        close_sessions()
+    sys.exit(returncode or 0)
+
+
 if __name__ == "__main__":
     main()
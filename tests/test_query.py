@@ -0,0 +1,187 @@
+"""query against a fake Odoo JSON-RPC server"""
+
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import oda  # pylint: disable=wrong-import-position
+
+RECORDS = [
+    {"id": i, "name": f"partner {i}", "parent_id": [1, "partner 1"] if i > 1 else False}
+    for i in range(1, 2501)
+]
+
+
+def matches(record, domain):
+    """Evaluate a prefix notation domain of id and name leaves on a record"""
+    ops = {
+        "=": lambda a, b: a == b,
+        ">": lambda a, b: a > b,
+        "<=": lambda a, b: a <= b,
+    }
+
+    def term(terms):
+        head = terms.pop(0)
+        if head == "|":
+            left, right = term(terms), term(terms)
+            return left or right
+        if head == "&":
+            left, right = term(terms), term(terms)
+            return left and right
+        if head == "!":
+            return not term(terms)
+        field, op, value = head
+        return ops[op](record[field], value)
+
+    terms = list(domain)
+    result = True
+    while terms:
+        result = term(terms) and result
+    return result
+
+
+def search(domain):
+    """Filter the fake records with a domain"""
+    return [r for r in RECORDS if matches(r, domain)]
+
+
+def fake_server():
+    """Start a fake JSON-RPC server counting connections and calls"""
+    stats = {"connections": set(), "calls": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            stats["connections"].add(self.client_address)
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            args = body["params"]["args"]
+            if body["params"]["method"] == "login":
+                result = 2 if args[2] == "admin" else False
+            else:
+                _, _, _, _, method, call_args, kwargs = args
+                stats["calls"].append((method, call_args, kwargs))
+                records = search(call_args[0])
+                if method == "search_count":
+                    result = len(records)
+                else:
+                    offset = kwargs["offset"]
+                    fields = ["id"] + kwargs["fields"] if kwargs["fields"] else None
+                    result = [
+                        {k: r[k] for k in fields or r}
+                        for r in records[offset : offset + kwargs["limit"]]
+                    ]
+            reply = json.dumps({"jsonrpc": "2.0", "id": None, "result": result})
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+class QueryTest(unittest.TestCase):
+    """oda query over JSON-RPC"""
+
+    def setUp(self):
+        self.server, self.stats = fake_server()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(tmp.cleanup)
+        os.makedirs(os.path.join(tmp.name, "conf"))
+        oda.save_odoo_conf(
+            os.path.join(tmp.name, "conf", "odoo.conf"),
+            oda.gen_odoo_conf("test", "1"),
+        )
+        with open(os.path.join(tmp.name, "test.yaml"), "w", encoding="UTF-8"):
+            pass
+        for patch in [
+            mock.patch.object(oda, "CWD", tmp.name),
+            mock.patch.object(oda, "project_name", return_value="test"),
+        ]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def query(self, *args, **kwargs):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            returncode = oda.query(*args, url=self.url, **kwargs)
+        return returncode, out.getvalue()
+
+    def test_pages_over_one_connection(self):
+        returncode, out = self.query("res.partner", limit=2300, offset=5)
+        rows = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual(returncode, 0)
+        self.assertEqual([r["id"] for r in rows], list(range(6, 2306)))
+        self.assertEqual(len(self.stats["connections"]), 1)
+        # later pages continue after the last id instead of using an offset
+        self.assertEqual(
+            [(c[1][0][:1], c[2]["offset"]) for c in self.stats["calls"]],
+            [([], 5), ([["id", ">", 1005]], 0), ([["id", ">", 2005]], 0)],
+        )
+
+    def test_csv_with_fields(self):
+        returncode, out = self.query(
+            "res.partner", fields="name,parent_id", fmt="csv", limit=2
+        )
+        self.assertEqual(returncode, 0)
+        self.assertEqual(
+            list(csv.reader(io.StringIO(out))),
+            [
+                ["id", "name", "parent_id"],
+                ["1", "partner 1", "False"],
+                ["2", "partner 2", '[1, "partner 1"]'],
+            ],
+        )
+
+    def test_count(self):
+        returncode, out = self.query(
+            "res.partner", domain="[('id', '<=', 10)]", count=True
+        )
+        self.assertEqual((returncode, out), (0, "10\n"))
+
+    def test_or_domain(self):
+        returncode, out = self.query(
+            "res.partner",
+            domain="['|', ('name', '=', 'partner 3'), ('name', '=', 'partner 1200')]",
+            fields="name",
+            batch_size=1,
+        )
+        self.assertEqual(returncode, 0)
+        self.assertEqual(
+            [json.loads(line)["id"] for line in out.splitlines()], [3, 1200]
+        )
+        self.assertEqual(self.stats["calls"][0][1][0][0], "|")
+
+    def test_invalid_domain(self):
+        returncode, out = self.query("res.partner", domain="('id', '=', 1)")
+        self.assertEqual(returncode, 1)
+        self.assertIn("invalid domain", out)
+
+    def test_login_failure(self):
+        returncode, out = self.query("res.partner", password="wrong")
+        self.assertEqual(returncode, 1)
+        self.assertIn("login failed", out)
+
+
+if __name__ == "__main__":
+    unittest.main()